@@ -0,0 +1,114 @@
+import os
+import gzip
+
+from incremental import output_path, write_atomic
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli (见 requirements.txt) 时只写 .gz，write_assets 会给出提示
+    brotli = None
+
+
+# === 离线静态资源与预压缩页面 ===
+# 设置 IRIS_ASSETS=local (python main.py build --offline) 后：
+#   - plotly.js 写成输出目录下唯一一份带版本号的 assets/plotly-<版本>.min.js，所有页面引用同一份 (浏览器只缓存一次)
+#   - 仪表盘的样式写成 assets/dashboard.css (仪表盘用到的 Bootstrap 类的精简实现)，不再访问 jsDelivr
+#   - 每个页面与资源文件另写 .gz (以及安装了 brotli 时的 .br) 预压缩版本，静态服务器可以直接返回
+# 默认 (cdn) 时页面与之前完全相同
+ASSET_DIR = "assets"
+PLOTLY_CDN = "https://cdn.plot.ly/plotly-{version}.min.js"
+BOOTSTRAP_CDN = "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css"
+DASHBOARD_CSS_PATH = f"{ASSET_DIR}/dashboard.css"
+
+DASHBOARD_CSS = """/* index.html 用到的 Bootstrap 5 类的精简实现 (离线模式，见 assets.py) */
+*, ::before, ::after { box-sizing: border-box; }
+body { margin: 0; font-size: 1rem; line-height: 1.5; color: #212529; }
+h1, h4 { margin-top: 0; margin-bottom: .5rem; font-weight: 500; line-height: 1.2; }
+h1 { font-size: calc(1.375rem + 1.5vw); }
+h4 { font-size: calc(1.275rem + .3vw); }
+@media (min-width: 1200px) { h1 { font-size: 2.5rem; } h4 { font-size: 1.5rem; } }
+p { margin-top: 0; margin-bottom: 1rem; }
+a { color: #0d6efd; }
+hr { margin: 1rem 0; color: inherit; border: 0; border-top: 1px solid; opacity: .25; }
+.container { width: 100%; padding-right: .75rem; padding-left: .75rem; margin-right: auto; margin-left: auto; }
+@media (min-width: 576px) { .container { max-width: 540px; } }
+@media (min-width: 768px) { .container { max-width: 720px; } .col-md-6 { flex: 0 0 auto; width: 50%; } }
+@media (min-width: 992px) { .container { max-width: 960px; } .col-lg-3 { flex: 0 0 auto; width: 25%; } }
+@media (min-width: 1200px) { .container { max-width: 1140px; } }
+@media (min-width: 1400px) { .container { max-width: 1320px; } }
+.row { --gx: 1.5rem; --gy: 0; display: flex; flex-wrap: wrap; margin-top: calc(-1 * var(--gy));
+       margin-right: calc(-.5 * var(--gx)); margin-left: calc(-.5 * var(--gx)); }
+.row > * { flex-shrink: 0; width: 100%; max-width: 100%; padding-right: calc(var(--gx) * .5);
+           padding-left: calc(var(--gx) * .5); margin-top: var(--gy); }
+.g-4 { --gx: 1.5rem; --gy: 1.5rem; }
+.card { position: relative; display: flex; flex-direction: column; min-width: 0; word-wrap: break-word;
+        border-radius: .375rem; }
+.card-title { margin-bottom: .5rem; }
+.btn { display: inline-block; padding: .375rem .75rem; font-size: 1rem; font-weight: 400; line-height: 1.5;
+       text-align: center; text-decoration: none; vertical-align: middle; cursor: pointer; user-select: none;
+       background: transparent; border: 1px solid transparent; border-radius: .375rem;
+       transition: color .15s, background-color .15s, border-color .15s; }
+.btn-outline-primary { color: #0d6efd; border-color: #0d6efd; }
+.btn-outline-primary:hover { color: #fff; background-color: #0d6efd; }
+.btn-outline-success { color: #198754; border-color: #198754; }
+.btn-outline-success:hover { color: #fff; background-color: #198754; }
+.lead { font-size: 1.25rem; font-weight: 300; }
+.small { font-size: .875em; }
+.text-muted { color: #6c757d !important; }
+.text-center { text-align: center !important; }
+.w-100 { width: 100% !important; }
+.mt-auto { margin-top: auto !important; }
+.mb-2 { margin-bottom: .5rem !important; }
+.mb-3 { margin-bottom: 1rem !important; }
+.mb-5 { margin-bottom: 3rem !important; }
+.my-5 { margin-top: 3rem !important; margin-bottom: 3rem !important; }
+.p-4 { padding: 1.5rem !important; }
+"""
+
+
+def offline():
+    return os.environ.get("IRIS_ASSETS", "cdn") == "local"
+
+
+def plotly_src(version):
+    """页面引用的 plotly.js 地址：离线模式下为输出目录中的共享副本 (相对路径)，否则为 CDN"""
+    return f"{ASSET_DIR}/plotly-{version}.min.js" if offline() else PLOTLY_CDN.format(version=version)
+
+
+def stylesheet_href():
+    return DASHBOARD_CSS_PATH if offline() else BOOTSTRAP_CDN
+
+
+def write_precompressed(path, data):
+    """
+    在 path 旁写出 .gz (以及 .br) 预压缩版本，返回写出的路径；gzip 头不含时间戳，同样的内容得到同样的文件
+    后缀见 incremental.PRECOMPRESSED_SUFFIXES
+    """
+    data = data.encode("utf-8") if isinstance(data, str) else data
+    write_atomic(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is None:
+        return [f"{path}.gz"]
+    write_atomic(f"{path}.br", brotli.compress(data, quality=11))
+    return [f"{path}.gz", f"{path}.br"]
+
+
+def write_page(path, text):
+    """写出页面 (离线模式下连同预压缩版本)，返回写出的全部路径"""
+    write_atomic(path, text)
+    return [path] + (write_precompressed(path, text) if offline() else [])
+
+
+def write_assets():
+    """离线模式：把 plotly.js (按版本只写一次) 与仪表盘样式写入输出目录的 assets/，返回写出的路径"""
+    from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+    if brotli is None:
+        print("⚠️  brotli is not installed: writing .gz only, no .br variants (pip install brotli)")
+    os.makedirs(output_path(ASSET_DIR), exist_ok=True)
+    js_path = output_path(plotly_src(get_plotlyjs_version()))
+    variants = [js_path, f"{js_path}.gz"] + ([f"{js_path}.br"] if brotli is not None else [])
+    if not all(map(os.path.exists, variants)):
+        write_page(js_path, get_plotlyjs())
+    css_path = output_path(DASHBOARD_CSS_PATH)
+    write_page(css_path, DASHBOARD_CSS)
+    return [js_path, css_path]
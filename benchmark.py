@@ -0,0 +1,397 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows 上没有 resource 模块，峰值 RSS 记为 None
+    resource = None
+
+from scheduler import PAGES, RESOLUTION_KNOBS, task_name
+
+
+# === 性能基准 ===
+# 对每个 (任务, 模型, 分辨率) 组合跑一遍 compute -> render，分别计时：
+#   fit_s       模型拟合 (common.fit_model 中实际发生的拟合)
+#   eval_s      网格求值 (common.evaluate_chunked 与八叉树采样 refine_boundary)
+#   assembly_s  图形组装 (render 除去 save_html 的部分)
+#   serialize_s save_html 序列化并写文件
+# 以及输出页面大小 html_bytes 与进程峰值内存 peak_rss_bytes。
+# 每个组合都在全新的子进程中运行 (缓存为空，峰值 RSS 互不影响)，磁盘网格缓存与模型缓存被禁用。
+#
+# 用法:
+#   python benchmark.py                              # 默认扫描，结果写入 benchmark_results.json
+#   python benchmark.py -r 20 50 -t task1 task3      # 只测部分分辨率 / 任务
+#   python benchmark.py -n 3 --compare baseline.json # 重新测量 (每组合取 3 次最小值) 并与基线比较，有回归时退出码为 1
+#   python benchmark.py --compare baseline.json --against benchmark_results.json  # 只比较两个已有文件
+#   python benchmark.py --figure-backend plotly -o plotly.json    # graph_objects 组装路径，可与默认的 dict 路径比较
+#   python benchmark.py --check                      # 只跑正确性检查 (见 CHECKS)，有失败时退出码为 1
+
+DEFAULT_RESOLUTIONS = [20, 50, 100, 200]
+DEFAULT_OUTPUT = "benchmark_results.json"
+METRICS = ["fit_s", "eval_s", "assembly_s", "serialize_s", "html_bytes", "peak_rss_bytes"]
+# 回归判定：相对基线增长超过 threshold，且绝对增量超过下限 (过滤计时噪声)
+REGRESSION_THRESHOLD = 0.10
+ABSOLUTE_FLOOR = {"fit_s": 0.02, "eval_s": 0.02, "assembly_s": 0.02, "serialize_s": 0.02,
+                  "html_bytes": 1024, "peak_rss_bytes": 8 * 1024 ** 2}
+
+
+# 任务名 -> (模块名, 计算函数名, 组装函数名, {分辨率常量名: 分辨率 -> 取值})，取自构建图
+TASKS = {task_name(filename): (module, compute, render, RESOLUTION_KNOBS[task_name(filename)])
+         for filename, module, compute, render in PAGES}
+
+
+# ==========================================
+# 1. 单个组合的测量 (在子进程中执行)
+# ==========================================
+class _Timer:
+    """累计被包装函数的耗时；嵌套调用只计最外层"""
+
+    def __init__(self):
+        self.total, self.depth = 0.0, 0
+
+    def wrap(self, func):
+        def timed(*args, **kwargs):
+            self.depth += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.total += time.perf_counter() - start
+        return timed
+
+
+@contextmanager
+def _patched(targets):
+    """targets: [(模块, 属性名, 新值)]；退出时恢复原值"""
+    saved = [(mod, name, getattr(mod, name)) for mod, name, _ in targets]
+    for mod, name, value in targets:
+        setattr(mod, name, value)
+    try:
+        yield
+    finally:
+        for mod, name, value in saved:
+            setattr(mod, name, value)
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux 上单位是 KB
+
+
+def run_case(task, model_idx, resolution, out_dir, figure_backend=None):
+    """测量一个 (任务, 模型, 分辨率) 组合，只组装该模型的单图页面；返回结果 dict"""
+    os.environ["IRIS_GRID_CACHE_DIR"] = ""
+    os.environ["IRIS_MODEL_CACHE_DIR"] = ""
+    import importlib
+    import common
+
+    module_name, compute_name, render_name, knobs = TASKS[task]
+    module = importlib.import_module(module_name)
+    fit, evaluate, serialize = _Timer(), _Timer(), _Timer()
+    page = {}
+
+    def save_html(fig, filename, title, **kwargs):
+        page["path"] = os.path.join(out_dir, f"{task}_{model_idx}_{resolution}_{os.path.basename(filename)}")
+        return common.save_html(fig, page["path"], title, **kwargs)
+
+    patches = [(module, name, to_value(resolution)) for name, to_value in knobs.items()]
+    patches += [(common, "FIGURE_BACKEND", figure_backend or common.FIGURE_BACKEND),
+                (common, "fit_model", fit.wrap(common.fit_model)),
+                (common, "evaluate_chunked", evaluate.wrap(common.evaluate_chunked)),
+                (common, "refine_boundary", evaluate.wrap(common.refine_boundary)),
+                (module, "save_html", serialize.wrap(save_html))]
+    with _patched(patches):
+        result = getattr(module, compute_name)(model_idx)
+        start = time.perf_counter()
+        getattr(module, render_name)([result])
+        render_s = time.perf_counter() - start
+
+    return {"task": task, "model": common.get_models()[model_idx][0], "model_idx": model_idx,
+            "resolution": resolution, "fit_s": fit.total, "eval_s": evaluate.total,
+            "assembly_s": render_s - serialize.total, "serialize_s": serialize.total,
+            "html_bytes": os.path.getsize(page["path"]), "peak_rss_bytes": _peak_rss_bytes()}
+
+
+def run_suite(tasks=None, resolutions=None, models=None, keep_pages=None, repeat=1, figure_backend=None):
+    """
+    逐个组合在新进程中串行测量 (并行会互相干扰计时与内存)；返回可写成 JSON 的 dict
+    repeat > 1 时每个组合测 repeat 次，各指标取最小值 (降低计时噪声)
+    """
+    import numpy, sklearn, plotly
+    from common import get_models, FIGURE_BACKEND
+
+    tasks = tasks or list(TASKS)
+    resolutions = resolutions or DEFAULT_RESOLUTIONS
+    models = models if models is not None else list(range(len(get_models())))
+    cases = [(t, m, r) for t in tasks for r in resolutions for m in models]
+    figure_backend = figure_backend or FIGURE_BACKEND
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = keep_pages or tmp
+        os.makedirs(out_dir, exist_ok=True)
+        # max_tasks_per_child=1：每个组合独占一个新进程
+        with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+            for i, (task, model_idx, resolution) in enumerate(cases, 1):
+                runs = [pool.submit(run_case, task, model_idx, resolution, out_dir, figure_backend).result()
+                        for _ in range(repeat)]
+                res = dict(runs[0])
+                for metric in METRICS:
+                    values = [r[metric] for r in runs if r[metric] is not None]
+                    res[metric] = min(values) if values else None
+                results.append(res)
+                print(f"⏱️  [{i}/{len(cases)}] {task} | {res['model']} | res={resolution}: "
+                      f"fit {res['fit_s']:.3f}s, eval {res['eval_s']:.3f}s, "
+                      f"assembly {res['assembly_s']:.3f}s, save {res['serialize_s']:.3f}s, "
+                      f"{res['html_bytes'] / 1024:.0f} KB")
+
+    meta = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "platform": platform.platform(),
+            "python": platform.python_version(), "cpu_count": os.cpu_count(),
+            "numpy": numpy.__version__, "sklearn": sklearn.__version__, "plotly": plotly.__version__,
+            "repeat": repeat, "figure_backend": figure_backend}
+    return {"meta": meta, "results": results}
+
+
+# ==========================================
+# 2. 与基线比较
+# ==========================================
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    按 (任务, 模型, 分辨率) 对齐两份结果，返回回归列表
+    每项: dict(task, model, resolution, metric, baseline, current, ratio)
+    """
+    def key(r):
+        return r["task"], r["model"], r["resolution"]
+
+    base = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for cur in current["results"]:
+        old = base.get(key(cur))
+        if old is None:
+            continue
+        for metric in METRICS:
+            a, b = old.get(metric), cur.get(metric)
+            if a is None or b is None:
+                continue
+            if b > a * (1 + threshold) and b - a > ABSOLUTE_FLOOR[metric]:
+                regressions.append({"task": cur["task"], "model": cur["model"],
+                                    "resolution": cur["resolution"], "metric": metric,
+                                    "baseline": a, "current": b, "ratio": b / a if a else float("inf")})
+    return regressions
+
+
+def report(regressions, baseline, current):
+    """打印比较结果；有回归时返回 False"""
+    matched = {(r["task"], r["model"], r["resolution"]) for r in baseline["results"]}
+    missing = [r for r in current["results"] if (r["task"], r["model"], r["resolution"]) not in matched]
+    if missing:
+        print(f"ℹ️  {len(missing)} case(s) have no baseline entry and were not compared")
+    if not regressions:
+        print("✅ No regressions against baseline.")
+        return True
+    print(f"❌ {len(regressions)} regression(s) against baseline:")
+    for r in regressions:
+        print(f"   {r['task']} | {r['model']} | res={r['resolution']} | {r['metric']}: "
+              f"{r['baseline']:.4g} -> {r['current']:.4g} (x{r['ratio']:.2f})")
+    return False
+
+
+# ==========================================
+# 3. 正确性检查
+# ==========================================
+def check_sphere_volume(resolution=41, radius=1.0, rel_tol=0.01):
+    """marching_cubes 的三角形一致朝外：球面网格的有向体积 ≈ +4/3·π·r³"""
+    import numpy as np
+    from common import marching_cubes
+
+    axes = [np.linspace(-1.5 * radius, 1.5 * radius, resolution)] * 3
+    X, Y, Z = np.meshgrid(*axes)
+    mesh = marching_cubes(axes, (radius - np.sqrt(X ** 2 + Y ** 2 + Z ** 2)).ravel(), 0.0)
+    tri = mesh["vertices"].astype(float)[mesh["faces"]]
+    volume = np.einsum("ij,ij->", tri[:, 0], np.cross(tri[:, 1], tri[:, 2])) / 6
+    expected = 4 / 3 * np.pi * radius ** 3
+    return abs(volume - expected) <= rel_tol * expected, f"signed volume {volume:.4f}, expected {expected:.4f}"
+
+
+def check_figure_backends(resolution=20):
+    """dict 后端与 graph_objects 后端组装出的页面 (含 LOD 附属文件) 逐字节一致；每个任务只计算一次"""
+    import glob
+    import filecmp
+    import importlib
+    import common
+
+    mismatched, pages = [], 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for task, (module_name, compute_name, render_name, knobs) in TASKS.items():
+            module = importlib.import_module(module_name)
+            dirs = {backend: os.path.join(tmp, task, backend) for backend in ("dict", "plotly")}
+
+            def save_html(fig, filename, title, **kwargs):
+                path = os.path.join(dirs[common.FIGURE_BACKEND], os.path.basename(filename))
+                return common.save_html(fig, path, title, **kwargs)
+
+            with _patched([(module, name, to_value(resolution)) for name, to_value in knobs.items()]):
+                results = [getattr(module, compute_name)(i) for i in range(len(common.get_models()))]
+                for backend, out_dir in dirs.items():
+                    os.makedirs(out_dir)
+                    with _patched([(common, "FIGURE_BACKEND", backend), (module, "save_html", save_html)]):
+                        getattr(module, render_name)(results)
+
+            names = sorted(os.path.basename(p) for p in glob.glob(os.path.join(dirs["plotly"], "*")))
+            match, mismatch, errors = filecmp.cmpfiles(dirs["plotly"], dirs["dict"], names, shallow=False)
+            mismatched += [f"{task}/{name}" for name in mismatch + errors]
+            pages += len(names)
+    detail = f"{pages} file(s) compared" + (f", differing: {', '.join(mismatched)}" if mismatched else "")
+    return not mismatched and pages > 0, detail
+
+
+def check_closed_form_speedup(resolution=97, repeat=5):
+    """
+    闭式网格求值对它服务的每个模型 (注册表中的 LR / NB，二分类与多分类各一次) 都比通用路径快：
+    两条路径各跑 repeat 次 evaluate_chunked，取最小耗时比较
+    """
+    from sklearn.base import clone
+    import common
+
+    def best_time(model, grid):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            common.evaluate_chunked(model, grid, memory_budget=1 << 40)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    ok, details = True, []
+    for classes, label in (((0, 1), "binary"), (None, "multiclass")):
+        X, y, _, _ = common.get_data(dims=3, classes=classes)
+        grid = common.GridSpec.from_data(X, resolution)
+        for name, model in common.get_models():
+            model = clone(model).fit(X, y)
+            if common.closed_form_evaluator(model, grid.axes, "predict_proba") is None:
+                continue
+            speedup = best_time(common._GenericOnly(model), grid) / best_time(model, grid)
+            ok &= speedup > 1
+            details.append(f"{name} {label} x{speedup:.1f}")
+    return ok and bool(details), f"closed form vs generic at {resolution}³: " + ", ".join(details)
+
+
+def check_float32_grid(resolution=65, atol=1e-3):
+    """
+    GridSpec(dtype=float32) 上专用求值器 (闭式 / KNN 分块) 仍然生效 (抽查不因 float32 舍入而回退到通用路径)，
+    且概率与 float64 网格上的结果只差舍入误差
+    """
+    import numpy as np
+    from sklearn.base import clone
+    import common
+
+    ok, details = True, []
+    for classes, label in (((0, 1), "binary"), (None, "multiclass")):
+        X, y, _, _ = common.get_data(dims=3, classes=classes)
+        grids = [common.GridSpec.from_data(X, resolution, dtype=dtype) for dtype in (np.float64, np.float32)]
+        for name, model in common.get_models():
+            model = clone(model).fit(X, y)
+            fast = common.fast_grid_evaluator(model, grids[1].axes, "predict_proba")
+            if fast is None:
+                continue
+            (p64, _), (p32, stats) = [common.evaluate_chunked(model, grid) for grid in grids]
+            error = float(np.abs(p32 - p64).max())
+            ok &= stats["evaluator"] == fast.kind and error <= atol
+            details.append(f"{name} {label} {stats['evaluator']} (max diff {error:.1e})")
+    return ok and bool(details), f"float32 {resolution}³: " + ", ".join(details)
+
+
+def check_octree_surface(base=8, depth=2):
+    """
+    八叉树边界面与同分辨率均匀网格上的 marching_cubes 完全相同 (同一套四面体剖分)：
+    两个相距很近的球 (有的单元里边界分成两片) 得到同样的三角形、同样的有向体积，且每条棱恰好被两个三角形共用
+    """
+    import numpy as np
+    from collections import Counter
+    from common import marching_cubes
+    from octree import refine_boundary
+
+    centers = np.array([[0.55, 0, 0], [-0.55, 0, 0]])
+    field = lambda p: 0.6 - np.linalg.norm(p[:, None, :] - centers, axis=2).min(axis=1)
+    mins, maxs = np.full(3, -1.5), np.full(3, 1.5)
+    octree = refine_boundary(field, mins, maxs, base=base, depth=depth, threshold=0.0)
+    axes = [np.linspace(-1.5, 1.5, octree["resolution"])] * 3
+    grid = marching_cubes(axes, field(np.stack([m.ravel() for m in np.meshgrid(*axes)], axis=1)), 0.0)
+
+    def triangles(mesh):
+        return sorted(tuple(sorted(map(tuple, np.round(mesh["vertices"][f], 5)))) for f in mesh["faces"])
+
+    def volume(mesh):
+        tri = mesh["vertices"].astype(float)[mesh["faces"]]
+        return np.einsum("ij,ij->", tri[:, 0], np.cross(tri[:, 1], tri[:, 2])) / 6
+
+    edges = Counter(tuple(sorted(e)) for f in octree["faces"].tolist() for e in ((f[0], f[1]), (f[1], f[2]), (f[2], f[0])))
+    same, closed = triangles(octree) == triangles(grid), set(edges.values()) == {2}
+    vols = volume(octree), volume(grid)
+    return same and closed and np.isclose(*vols), \
+        f"{len(octree['faces'])} faces, same as grid: {same}, watertight: {closed}, volume {vols[0]:.4f} / {vols[1]:.4f}"
+
+
+CHECKS = [check_sphere_volume, check_figure_backends, check_closed_form_speedup, check_float32_grid,
+          check_octree_surface]
+
+
+def run_checks():
+    """依次运行 CHECKS，打印结果；全部通过时返回 True"""
+    ok = True
+    for check in CHECKS:
+        passed, detail = check()
+        ok &= passed
+        print(f"{'✅' if passed else '❌'} {check.__name__}: {detail}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fit / grid evaluation / assembly / save_html per task.")
+    parser.add_argument("-r", "--resolutions", type=int, nargs="+", default=DEFAULT_RESOLUTIONS)
+    parser.add_argument("-t", "--tasks", nargs="+", choices=list(TASKS), default=list(TASKS))
+    parser.add_argument("-m", "--models", type=int, nargs="+", help="model indices in get_models() (default: all)")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("-n", "--repeat", type=int, default=1, help="runs per case, keeping the minimum")
+    parser.add_argument("--keep-pages", metavar="DIR", help="keep the generated pages in DIR")
+    parser.add_argument("--figure-backend", choices=["dict", "plotly"],
+                        help="figure assembly path (default: IRIS_FIGURE_BACKEND or dict)")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a stored baseline JSON")
+    parser.add_argument("--against", metavar="CURRENT", help="compare an existing result file instead of re-running")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative slowdown that counts as a regression (default: 0.10)")
+    parser.add_argument("--check", action="store_true", help="run the correctness checks instead of benchmarking")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        return 0 if run_checks() else 1
+    if args.against:
+        with open(args.against, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args.tasks, args.resolutions, args.models, args.keep_pages, args.repeat,
+                            args.figure_backend)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        ok = report(compare(baseline, current, args.threshold), baseline, current)
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,71 +1,680 @@
+import os
+import csv
+import glob
+import json
+import base64
+import hashlib
+import pickle
+import time
+import re
+import tracemalloc
+from math import prod
+from itertools import islice
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import sklearn
 import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+from plotly.subplots import make_subplots
+from plotly.colors import qualitative
 from sklearn.datasets import load_iris
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import make_pipeline
 from sklearn.linear_model import LogisticRegression
-from sklearn.neighbors import KNeighborsClassifier
+from sklearn.neighbors import KNeighborsClassifier, KDTree
 from sklearn.svm import SVC
 from sklearn.naive_bayes import GaussianNB
+from octree import refine_boundary
+from incremental import output_path, companion_paths
+from assets import offline, plotly_src, write_page
+from tracing import span, traced, reset_peak
 
 
-# === 1. 数据获取 ===
-def get_data(dims=2, binary=False):
+# === 1. 数据获取 (数据集加载层) ===
+# 数据源由环境变量 IRIS_DATASET 指定，未设置时使用 sklearn 自带的 iris：
+#   - .npy：二维数值表，直接内存映射
+#   - .csv：首行为列名，按块解析后转换成 .npy 缓存 (.iris_cache/datasets/)，以后直接内存映射
+#   - 目录 / 通配符：按文件名顺序拼接的多个分块文件 (csv / npy)，同样转换成一份 .npy 缓存
+# 标签列由 IRIS_LABEL_COLUMN 指定 (列名或下标，默认最后一列)，标签值排序后编号为 0..C-1 (数值标签按数值排序)
+# 各任务使用的特征列默认与 iris 的约定一致，可由 IRIS_FEATURES_2D / IRIS_FEATURES_3D (逗号分隔的列名或下标) 覆盖
+# 同一进程内数据集与每个 (特征, 类别) 切片都只加载一次，返回的数组是只读的
+DEFAULT_FEATURES = {
+    2: "2,3",    # [Petal Length, Petal Width]：iris 中区分度最高的两个特征
+    3: "0,1,2",  # [Sepal Length, Sepal Width, Petal Length]
+}
+CSV_CHUNK_ROWS = 1 << 16  # CSV 转换时每块解析的行数
+# table: 数值表 (通常是 memmap)；columns: 各特征在 table 中的列号；target: 类别编号
+Dataset = namedtuple("Dataset", "table columns feature_names target target_names")
+_datasets = {}
+_data_slices = {}
+
+
+def _dataset_cache_dir():
+    return os.environ.get("IRIS_DATASET_CACHE_DIR") or os.path.join(".iris_cache", "datasets")
+
+
+def _resolve_columns(spec, names, what="feature"):
+    """"2,3" / ["petal length (cm)", 3] -> 列下标元组 (支持负数下标)"""
+    items = spec.split(",") if isinstance(spec, str) else list(spec)
+    cols = []
+    for item in items:
+        item = item.strip() if isinstance(item, str) else item
+        if isinstance(item, str) and item.lstrip("-").isdigit():
+            item = int(item)
+        if isinstance(item, str):
+            if item not in names:
+                raise ValueError(f"Unknown {what} column {item!r}; available: {list(names)}")
+            item = list(names).index(item)
+        if not -len(names) <= item < len(names):
+            hint = " (set IRIS_FEATURES_2D / IRIS_FEATURES_3D for this dataset)" if what == "feature" else ""
+            raise ValueError(f"{what.capitalize()} column {item} out of range for {len(names)} columns{hint}")
+        cols.append(item % len(names))
+    return tuple(cols)
+
+
+def _label_str(value):
     """
-    根据任务需求返回 X, y, feature_names
-    dims=2 时强制使用花瓣特征(Petal, 列2/3)，因为区分度最好
+    标签值 -> 类别名。数值标签 (npy 分块) 经 numpy 转成浮点数，整数值取整数写法 (1.0 -> "1")，不保留原文件里的写法；
+    csv 的标签读出来就是字符串，原样保留 (因此 csv 里的 "1.0" 与 "1" 是两个类别)
     """
-    iris = load_iris()
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
 
-    if dims == 2:
-        # 2D模式使用 [Petal Length, Petal Width] (索引 2, 3)
-        # 这也是 Iris 数据集中区分度最高的两个特征
-        X = iris.data[:, 2:]
-        names = [iris.feature_names[2], iris.feature_names[3]]
+
+def _label_codes(values):
+    """标签值 -> (编号数组, 类别名数组)；全为数值时按数值排序"""
+    names, codes = np.unique(np.asarray(values), return_inverse=True)
+    try:
+        order = np.argsort(names.astype(float), kind="stable")
+    except ValueError:
+        order = np.arange(len(names))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[codes].astype(np.intp), np.array([_label_str(n) for n in names[order]])
+
+
+def _dataset_parts(source):
+    """数据源 -> 按名称排序的文件列表 (单个文件 / 目录 / 通配符)"""
+    if os.path.isdir(source):
+        parts = [os.path.join(source, f) for f in os.listdir(source) if f.endswith((".csv", ".npy"))]
     else:
-        # 3D模式使用 [Sepal Length, Sepal Width, Petal Length] (索引 0, 1, 2)
-        X = iris.data[:, :3]
-        names = iris.feature_names[:3]
+        parts = glob.glob(source)
+    if not parts:
+        raise FileNotFoundError(f"No .csv / .npy dataset files found for {source!r}")
+    return sorted(parts)
+
+
+def _read_csv_header(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f))
 
-    y = iris.target
 
-    if binary:  # 如果是二分类，移除第3类 (Class 2: Virginica)
-        mask = y != 2
-        X, y = X[mask], y[mask]
+def _iter_part_rows(path, chunk_rows):
+    """逐块产出一个分块文件的内容：csv 为字符串行的列表，npy 为 memmap 切片"""
+    if path.endswith(".npy"):
+        table = np.load(path, mmap_mode="r")
+        for start in range(0, len(table), chunk_rows):
+            yield table[start:start + chunk_rows]
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)  # 表头
+        while True:
+            rows = list(islice(reader, chunk_rows))
+            if not rows:
+                return
+            yield rows
 
-    return X, y, names, iris.target_names
+
+def _convert_parts(parts, label_spec, prefix):
+    """两遍扫描：先统计行数与标签取值，再逐块写入 <prefix>.npy (特征) / .labels.npy / .json"""
+    first = parts[0]
+    names = _read_csv_header(first) if first.endswith(".csv") else \
+        [f"feature {i}" for i in range(np.load(first, mmap_mode="r").shape[1])]
+    label = _resolve_columns(str(label_spec), names, "label")[0]
+    feature_cols = [i for i in range(len(names)) if i != label]
+
+    n_rows, labels = 0, set()
+    for part in parts:
+        for rows in _iter_part_rows(part, CSV_CHUNK_ROWS):
+            n_rows += len(rows)
+            raw = rows[:, label].tolist() if isinstance(rows, np.ndarray) else [r[label] for r in rows]
+            labels.update(map(_label_str, raw))
+    _, target_names = _label_codes(sorted(labels))
+    code_of = {name: i for i, name in enumerate(target_names)}
+
+    tmp = f"{prefix}.{os.getpid()}.tmp"
+    table = np.lib.format.open_memmap(f"{tmp}.npy", mode="w+", dtype=np.float64,
+                                      shape=(n_rows, len(feature_cols)))
+    target = np.lib.format.open_memmap(f"{tmp}.labels.npy", mode="w+", dtype=np.intp, shape=(n_rows,))
+    start = 0
+    for part in parts:
+        for rows in _iter_part_rows(part, CSV_CHUNK_ROWS):
+            stop = start + len(rows)
+            if isinstance(rows, np.ndarray):
+                table[start:stop] = rows[:, feature_cols]
+                raw = rows[:, label].tolist()
+            else:
+                table[start:stop] = np.array([[r[i] for i in feature_cols] for r in rows], dtype=np.float64)
+                raw = [r[label] for r in rows]
+            target[start:stop] = [code_of[_label_str(v)] for v in raw]
+            start = stop
+    table.flush()
+    target.flush()
+    del table, target
+    with open(f"{tmp}.json", "w", encoding="utf-8") as f:
+        json.dump({"feature_names": [names[i] for i in feature_cols],
+                   "target_names": target_names.tolist()}, f)
+    # 元数据最后就位：它存在即表示整份缓存完整
+    os.replace(f"{tmp}.npy", f"{prefix}.npy")
+    os.replace(f"{tmp}.labels.npy", f"{prefix}.labels.npy")
+    os.replace(f"{tmp}.json", f"{prefix}.json")
+
+
+def _load_file_dataset(source, label_spec):
+    parts = _dataset_parts(source)
+    if len(parts) == 1 and parts[0].endswith(".npy"):
+        table = np.load(parts[0], mmap_mode="r")
+        names = [f"feature {i}" for i in range(table.shape[1])]
+        label = _resolve_columns(str(label_spec), names, "label")[0]
+        target, target_names = _label_codes(table[:, label])
+        columns = tuple(i for i in range(table.shape[1]) if i != label)
+        return Dataset(table, columns, [names[i] for i in columns], target, target_names)
+
+    # CSV / 分块文件：按 (路径, 大小, 修改时间, 标签列) 转换并缓存成 .npy
+    h = hashlib.sha256(str(label_spec).encode())
+    for part in parts:
+        st = os.stat(part)
+        h.update(f"{os.path.abspath(part)}{st.st_size}{st.st_mtime_ns}".encode())
+    cache_dir = _dataset_cache_dir()
+    prefix = os.path.join(cache_dir, h.hexdigest())
+    if not os.path.exists(f"{prefix}.json"):
+        os.makedirs(cache_dir, exist_ok=True)
+        print(f"📦 Converting {len(parts)} dataset file(s) from {source} to {prefix}.npy ...")
+        _convert_parts(parts, label_spec, prefix)
+    with open(f"{prefix}.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    table = np.load(f"{prefix}.npy", mmap_mode="r")
+    return Dataset(table, tuple(range(table.shape[1])), meta["feature_names"],
+                   np.load(f"{prefix}.labels.npy", mmap_mode="r"), np.array(meta["target_names"]))
+
+
+def load_dataset(source=None):
+    """加载 (并在进程内记忆) 数据源；source 默认取 IRIS_DATASET，为空时使用 iris"""
+    source = os.environ.get("IRIS_DATASET", "") if source is None else source
+    label_spec = os.environ.get("IRIS_LABEL_COLUMN", "-1")
+    key = (source, label_spec)
+    if key not in _datasets:
+        if source:
+            _datasets[key] = _load_file_dataset(source, label_spec)
+        else:
+            iris = load_iris()
+            _datasets[key] = Dataset(iris.data, tuple(range(iris.data.shape[1])), list(iris.feature_names),
+                                     iris.target, iris.target_names)
+    return _datasets[key]
+
+
+@traced("get_data")
+def get_data(dims=2, binary=False, features=None, classes=None, source=None):
+    """
+    根据任务需求返回 X, y, feature_names, target_names (同一进程内按参数记忆，数组只读)
+    features: 特征列 (下标或列名)，默认取 IRIS_FEATURES_<dims>D，未设置时为 DEFAULT_FEATURES[dims]
+    classes: 只保留这些类别 (编号或类别名)，y 保留原编号、target_names 不变；binary=True 等价于 classes=(0, 1)
+    """
+    ds = load_dataset(source)
+    if features is None:
+        features = os.environ.get(f"IRIS_FEATURES_{dims}D", DEFAULT_FEATURES.get(dims, ""))
+    cols = _resolve_columns(features, ds.feature_names)
+    if classes is None and binary:
+        classes = (0, 1)
+    if classes is not None:
+        classes = _resolve_columns(classes, list(ds.target_names), "class")
+
+    key = (id(ds), cols, classes)
+    if key not in _data_slices:
+        X = np.asarray(ds.table[:, [ds.columns[c] for c in cols]])
+        y = np.asarray(ds.target)
+        if classes is not None:
+            mask = np.isin(y, classes)
+            X, y = X[mask], y[mask]
+        for arr in (X, y):
+            arr.flags.writeable = False
+        _data_slices[key] = X, y, [ds.feature_names[c] for c in cols], ds.target_names
+    return _data_slices[key]
+
+
+# === 2. 模型定义 (注册表 + 共享预处理) ===
+# 注册表：(名称, 工厂)，工厂返回未拟合的最终估计器；get_models() 统一在前面接上 StandardScaler
+# 追加模型用 register_model，应在模块导入时完成 (进程池以 spawn 启动时 worker 会重新导入模块)
+MODEL_REGISTRY = [
+    ("Log Reg", LogisticRegression),
+    ("KNN (k=5)", lambda: KNeighborsClassifier(n_neighbors=5)),
+    # 固定 random_state：SVC 的 Platt 概率校准内部使用随机交叉验证，否则每次构建结果不同
+    ("SVM (RBF)", lambda: SVC(probability=True, random_state=0)),
+    ("Naive Bayes", GaussianNB),
+]
+
+
+def register_model(name, factory):
+    """注册一个模型 (factory() 返回未拟合的估计器)；同名模型会被替换，位置不变"""
+    for i, (existing, _) in enumerate(MODEL_REGISTRY):
+        if existing == name:
+            MODEL_REGISTRY[i] = (name, factory)
+            return
+    MODEL_REGISTRY.append((name, factory))
+
+
+def _selected_registry():
+    """注册表中被选中的 (名称, 工厂)：设置 IRIS_MODELS (名称或下标，逗号分隔) 时只取其中的模型"""
+    if not os.environ.get("IRIS_MODELS"):
+        return MODEL_REGISTRY
+    names = [name for name, _ in MODEL_REGISTRY]
+    return [MODEL_REGISTRY[i] for i in _resolve_columns(os.environ["IRIS_MODELS"], names, "model")]
 
 
-# === 2. 模型定义 ===
 def get_models():
-    """返回4个标准化的模型管道"""
-    return [
-        ("Log Reg", make_pipeline(StandardScaler(), LogisticRegression())),
-        ("KNN (k=5)", make_pipeline(StandardScaler(), KNeighborsClassifier(n_neighbors=5))),
-        ("SVM (RBF)", make_pipeline(StandardScaler(), SVC(probability=True))),
-        ("Naive Bayes", make_pipeline(StandardScaler(), GaussianNB()))
-    ]
+    """返回注册表中每个模型的标准化管道；设置 IRIS_MODELS (名称或下标，逗号分隔) 时只取其中的模型"""
+    return [(name, make_pipeline(StandardScaler(), factory())) for name, factory in _selected_registry()]
+
 
+# 共享预处理：所有管道的 StandardScaler 在同一份 X 上拟合出相同的统计量，
+# 因此每个数据集只拟合一次 (连同变换后的 X 一起缓存)，各管道只拟合最终估计器；
+# 网格求值走通用路径时，标准化后的网格坐标轴也按 (统计量, 网格) 缓存，由所有模型共用。
+# 变换与管道内部完全相同 (原地减均值、除尺度)，结果逐位一致；IRIS_SHARED_PREPROCESSING=0 关闭
+SHARED_PREPROCESSING = os.environ.get("IRIS_SHARED_PREPROCESSING", "1") != "0"
+SHARED_CACHE_SIZE = 16
+_scaler_cache = OrderedDict()
+_scaled_grid_cache = OrderedDict()
 
-# === 3. 3D网格生成器 ===
-def make_3d_grid(X, resolution=20):
-    """生成用于3D预测的坐标网格"""
-    margin = 0.5
-    x_min, x_max = X[:, 0].min() - margin, X[:, 0].max() + margin
-    y_min, y_max = X[:, 1].min() - margin, X[:, 1].max() + margin
-    z_min, z_max = X[:, 2].min() - margin, X[:, 2].max() + margin
 
-    x = np.linspace(x_min, x_max, resolution)
-    y = np.linspace(y_min, y_max, resolution)
-    z = np.linspace(z_min, z_max, resolution)
+def _lru_get(cache, key, compute):
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    cache[key] = value = compute()
+    while len(cache) > SHARED_CACHE_SIZE:
+        cache.popitem(last=False)
+    return value
+
+
+def _shared_steps(model):
+    """管道形如 "默认参数的 StandardScaler -> 估计器" 时返回 (scaler, 估计器)，否则返回 None"""
+    steps = [step for _, step in model.steps] if hasattr(model, "steps") else []
+    if len(steps) != 2 or type(steps[0]) is not StandardScaler:
+        return None
+    if steps[0].get_params() != StandardScaler().get_params():
+        return None
+    return steps[0], steps[1]
+
+
+def shared_scaler(X):
+    """在 X 上拟合 (并缓存) 的 StandardScaler 与变换后的 X"""
+    def fit():
+        with span("fit", estimator="StandardScaler"):
+            scaler = StandardScaler().fit(X)
+            return scaler, scaler.transform(X)
+    h = hashlib.sha256()
+    _hash_array(h, X)
+    return _lru_get(_scaler_cache, h.hexdigest(), fit)
+
+
+def _fit_shared(X, y, model):
+    """共享预处理模式下拟合管道：换上共享的 scaler，只拟合最终估计器；不适用时返回 False"""
+    parts = _shared_steps(model) if SHARED_PREPROCESSING else None
+    if parts is None:
+        return False
+    scaler, Xt = shared_scaler(X)
+    with span("fit", estimator=type(parts[1]).__name__):
+        parts[1].fit(Xt, y)
+    model.steps[0] = (model.steps[0][0], scaler)
+    return True
+
+
+def shared_grid(model, axes):
+    """
+    已拟合的 "StandardScaler -> 估计器" 管道在坐标轴网格上的等价形式：(估计器, 标准化后的坐标轴)
+    标准化逐轴独立，变换坐标轴再展开与展开后再变换逐位相同；不适用时返回 None
+    """
+    parts = _shared_steps(model) if SHARED_PREPROCESSING and axes else None
+    if parts is None:
+        return None
+    scaler, est = parts
 
-    xx, yy, zz = np.meshgrid(x, y, z)
-    return xx, yy, zz, np.c_[xx.ravel(), yy.ravel(), zz.ravel()]
+    def scale():
+        scaled = []
+        for d, axis in enumerate(map(np.asarray, axes)):
+            values = np.array(axis, dtype=axis.dtype if axis.dtype.kind == "f" else float)
+            # 与 StandardScaler.transform 相同：统计量先转成网格的 dtype，再原地运算
+            values -= scaler.mean_.astype(values.dtype)[d]
+            values /= scaler.scale_.astype(values.dtype)[d]
+            scaled.append(values)
+        return tuple(scaled)
+    h = hashlib.sha256()
+    for arr in (scaler.mean_, scaler.scale_) + tuple(axes):
+        _hash_array(h, arr)
+    return est, _lru_get(_scaled_grid_cache, h.hexdigest(), scale)
+
+
+# === 3. 网格描述 (GridSpec) ===
+def get_bounds(X, margin=0.5):
+    """每个特征的取值范围向外扩 margin，返回 (mins, maxs)"""
+    return X.min(axis=0) - margin, X.max(axis=0) + margin
+
+
+class GridSpec:
+    """
+    笛卡尔网格的描述：每维的范围、分辨率与 dtype，只保存一维坐标轴，不物化完整网格
+    展平顺序与 np.meshgrid 默认的 'xy' 索引一致 (前两维互换)，可直接交给 predict_grid 分块求值
+      - mesh(): 完整网格的只读广播视图 (不占额外内存)
+      - flat(d): 第 d 维展平后的坐标 (即 xx.flatten())，首次访问时生成并缓存
+    分块求值由 evaluate_chunked 负责 (块大小随内存预算调整，只按需生成每块的点，见 grid_rows)
+    """
+
+    def __init__(self, mins, maxs, resolution, dtype=np.float64):
+        self.mins, self.maxs = np.asarray(mins, dtype=float), np.asarray(maxs, dtype=float)
+        ndim = len(self.mins)
+        self.resolution = tuple(resolution) if np.iterable(resolution) else (resolution,) * ndim
+        self.dtype = np.dtype(dtype)
+        self.axes = tuple(np.linspace(lo, hi, n).astype(self.dtype, copy=False)
+                          for lo, hi, n in zip(self.mins, self.maxs, self.resolution))
+        self._flat = {}
+
+    @classmethod
+    def from_data(cls, X, resolution, margin=0.5, dtype=np.float64):
+        """覆盖数据 X 的网格 (各维向外扩 margin)"""
+        mins, maxs = get_bounds(X, margin)
+        return cls(mins, maxs, resolution, dtype)
+
+    @property
+    def ndim(self):
+        return len(self.axes)
+
+    @property
+    def shape(self):
+        return grid_shape(self.axes)
+
+    @property
+    def size(self):
+        return prod(self.resolution)
+
+    def coarsen(self, step):
+        """每维隔 step 个点取一个的子网格 (坐标轴直接切片，与本网格的节点严格重合)"""
+        if any((n - 1) % step for n in self.resolution):
+            raise ValueError(f"Resolution {self.resolution} cannot be coarsened by {step}")
+        coarse = GridSpec(self.mins, self.maxs, [(n - 1) // step + 1 for n in self.resolution], self.dtype)
+        coarse.axes = tuple(axis[::step] for axis in self.axes)
+        return coarse
+
+    def mesh(self):
+        """等价于 np.meshgrid(*axes)，但返回的是只读广播视图"""
+        return tuple(np.broadcast_to(m, self.shape) for m in np.meshgrid(*self.axes, sparse=True))
+
+    def flat(self, d):
+        """第 d 维的展平坐标 (只读，同一个 GridSpec 上的多个 trace 共用一份)"""
+        if d not in self._flat:
+            values = self.mesh()[d].ravel()
+            values.flags.writeable = False
+            self._flat[d] = values
+        return self._flat[d]
+
+
+def _grid_axes(grid):
+    """GridSpec / 坐标轴元组 -> 坐标轴元组；(N, d) 点阵返回 None"""
+    if isinstance(grid, GridSpec):
+        return grid.axes
+    if isinstance(grid, (tuple, list)):
+        return tuple(grid)
+    return None
+
+
+def make_3d_grid(X, resolution=20, dtype=np.float64):
+    """覆盖前三个特征的 3D 网格 (GridSpec)"""
+    return GridSpec.from_data(X[:, :3], resolution, dtype=dtype)
 
 
 # === 4. 网页保存助手 (带返回按钮) ===
-def save_html(fig, filename, title):
-    """保存HTML，并添加原生的悬浮返回按钮"""
+# 紧凑模式：所有数组放进一张去重的数组表，以 base64 类型化数组存储
+#   - [0, 1] 内的浮点数 (概率) 量化为 uint16，其余浮点数存 float32，整数取最窄的类型
+#   - 网格坐标 (xx.flatten() 这类 repeat/tile 结构) 只存一条坐标轴，由浏览器端展开
+#   - 多个 trace 共用的相同数组只存一份
+COMPACT_MIN_SIZE = 16  # 更短的数组直接内联
+
+
+def _narrow_int(arr):
+    for dtype in ("u1", "i1", "u2", "i2", "u4", "i4"):
+        info = np.iinfo(dtype)
+        if arr.min() >= info.min and arr.max() <= info.max:
+            return arr.astype(dtype)
+    return arr.astype("f8")
+
+
+def _axis_pattern(arr):
+    """若 arr == np.tile(np.repeat(axis, inner), outer)，返回 (axis, inner, outer)；含 NaN/inf 开头时不识别"""
+    if not np.isfinite(arr[0]):
+        return None
+    changes = np.flatnonzero(arr != arr[0])
+    if changes.size == 0:
+        return None
+    inner = changes[0]
+    blocks = arr[::inner]
+    recur = np.flatnonzero(blocks[1:] == blocks[0])
+    period = recur[0] + 1 if recur.size else blocks.size
+    if arr.size % (inner * period) or period * 4 > arr.size:
+        return None
+    axis = blocks[:period]
+    outer = arr.size // (inner * period)
+    if not np.array_equal(np.tile(np.repeat(axis, inner), outer), arr):
+        return None
+    return axis, int(inner), int(outer)
+
+
+class _ArrayTable:
+    """收集页面中的数组：编码、去重，原位置替换为 {"$ref": 编号}"""
+
+    def __init__(self):
+        self.entries, self.index = [], {}
+
+    def ref(self, arr):
+        h = hashlib.sha1(f"{arr.dtype.str}{arr.shape}".encode() + np.ascontiguousarray(arr).tobytes())
+        key = h.hexdigest()
+        if key not in self.index:
+            idx = self.index[key] = len(self.entries)
+            self.entries.append(None)  # 先占位：编码坐标轴时可能递归登记新的数组
+            self.entries[idx] = self._encode(arr)
+        return {"$ref": self.index[key]}
+
+    def _encode(self, arr):
+        entry = {"shape": list(arr.shape)} if arr.ndim > 1 else {}
+        if arr.ndim == 1 and arr.dtype.kind in "fiu":
+            pattern = _axis_pattern(arr)
+            if pattern is not None:
+                axis, inner, outer = pattern
+                entry.update(axis=self.ref(axis)["$ref"], inner=inner, outer=outer)
+                return entry
+        if arr.dtype.kind == "f":
+            if np.isfinite(arr).all() and arr.min() >= 0 and arr.max() <= 1:
+                packed = np.round(arr * 65535).astype("u2")
+                entry["scale"] = 1 / 65535
+            elif np.array_equal(arr, np.round(arr)) and np.abs(arr).max() < 2 ** 31:
+                packed = _narrow_int(arr)
+            else:
+                packed = arr.astype("f4")
+        elif arr.dtype.kind in "iu":
+            packed = _narrow_int(arr)
+        else:
+            raise TypeError(arr.dtype)
+        entry.update(dtype=packed.dtype.str[1:],
+                     data=base64.b64encode(np.ascontiguousarray(packed).tobytes()).decode())
+        return entry
+
+    def collect(self, obj):
+        """把 to_plotly_json 结果中的 bdata / numpy 数组换成数组表引用"""
+        if isinstance(obj, dict):
+            if "bdata" in obj and "dtype" in obj:
+                arr = np.frombuffer(base64.b64decode(obj["bdata"]), dtype=obj["dtype"])
+                if "shape" in obj:
+                    shape = obj["shape"]
+                    arr = arr.reshape([int(n) for n in shape.split(",")] if isinstance(shape, str) else shape)
+                return self.collect(arr)
+            return {k: self.collect(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [self.collect(v) for v in obj]
+        if isinstance(obj, np.ndarray):
+            if obj.size < COMPACT_MIN_SIZE or obj.dtype.kind not in "fiu":
+                return obj.tolist()
+            return self.ref(obj)
+        return obj
+
+
+def _to_json(obj):
+    """
+    pio.json.to_json_plotly，但 "/" 不转义：< 与 > 仍被转义，嵌入 <script> 不会提前结束；
+    而量化后接近 0 / 1 的概率在 base64 中是大段的 "////"，逐个转义会让数据膨胀一倍以上
+    """
+    text = pio.json.to_json_plotly(obj)
+    if "\\\\u002f" in text:  # 罕见：字符串里有转义的反斜杠紧跟 u002f，逐个判断前面的反斜杠个数
+        return re.sub(r'(?<!\\)((?:\\\\)*)\\u002f', r'\1/', text)
+    return text.replace("\\u002f", "/")
+
+
+# 浏览器端解码：还原类型化数组 (反量化、展开坐标轴)，再交给 Plotly.newPlot
+# 数组表的解码函数 (types / decode / resolve)，依赖外层作用域中的 spec；LOD 级别的数据复用同一段代码
+_DECODE_JS = """    var types = {u1: Uint8Array, i1: Int8Array, u2: Uint16Array, i2: Int16Array,
+                 u4: Uint32Array, i4: Int32Array, f4: Float32Array, f8: Float64Array};
+    var decoded = {};
+    function decode(id) {
+        if (decoded[id]) return decoded[id];
+        var e = spec.arrays[id], out;
+        if (e.axis !== undefined) {
+            var axis = decode(e.axis), n = 0;
+            out = new axis.constructor(axis.length * e.inner * e.outer);
+            for (var o = 0; o < e.outer; o++)
+                for (var a = 0; a < axis.length; a++)
+                    for (var r = 0; r < e.inner; r++) out[n++] = axis[a];
+        } else {
+            var bin = atob(e.data), bytes = new Uint8Array(bin.length);
+            for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+            out = new types[e.dtype](bytes.buffer);
+            if (e.scale !== undefined) {
+                var scaled = new Float32Array(out.length);
+                for (var j = 0; j < out.length; j++) scaled[j] = out[j] * e.scale;
+                out = scaled;
+            }
+        }
+        if (e.shape) {  // 二维数组 (如 Heatmap 的 z) 还原为按行的数组
+            var rows = [], w = e.shape[1];
+            for (var k = 0; k < e.shape[0]; k++) rows.push(out.subarray(k * w, (k + 1) * w));
+            out = rows;
+        }
+        return (decoded[id] = out);
+    }
+    function resolve(obj) {
+        if (Array.isArray(obj)) return obj.map(resolve);
+        if (obj && typeof obj === "object") {
+            if ("$ref" in obj) return decode(obj["$ref"]);
+            for (var key in obj) obj[key] = resolve(obj[key]);
+        }
+        return obj;
+    }
+"""
+_COMPACT_JS = """
+(function () {
+    var spec = JSON.parse(document.getElementById("%(div_id)s-spec").textContent);
+""" + _DECODE_JS + """    Plotly.newPlot("%(div_id)s", resolve(spec.data), resolve(spec.layout), {responsive: true});
+})();
+"""
+
+
+# LOD 切换：更细的级别各自写在页面旁的 <页面名>.lod<N>.js 里，不计入首屏；点击时才以 <script> 加载
+# (file:// 下 fetch 被浏览器拦截，script 标签不受影响)，解码后与初始 trace 合并再 Plotly.react
+_LOD_JS = """
+(function () {
+    var gd = document.getElementById("%(div_id)s"), base = null, loaded = {}, current = 0, pending = null;
+    var buttons = document.querySelectorAll("#%(div_id)s-lod button");
+    function load(level, done) {
+        if (loaded[level]) return done(loaded[level]);
+        var script = document.createElement("script");
+        script.src = "%(div_id)s.lod" + level + ".js";
+        script.onload = function () {
+            var spec = window.IrisLod["%(div_id)s-" + level];
+""" + _DECODE_JS + """            done(loaded[level] = resolve(spec.update));
+        };
+        document.head.appendChild(script);
+    }
+    function show(level) {
+        if (level === current) return;
+        base = base || gd.data.slice();
+        pending = level;
+        buttons.forEach(function (b, i) { b.classList.toggle("active", i === level); });
+        (level > 0 ? load : function (l, done) { done({}); })(level, function (update) {
+            if (pending !== level) return;  // 加载期间又切换了级别
+            var data = base.slice();
+            for (var idx in update) data[idx] = Object.assign({}, base[idx], update[idx]);
+            Plotly.react(gd, data, gd.layout);
+            current = level;
+        });
+    }
+    buttons.forEach(function (b, i) { b.addEventListener("click", function () { show(i); }); });
+})();
+"""
+_LOD_CSS = """
+        .lod-bar { position: fixed; top: 20px; right: 20px; z-index: 9999; font-size: 13px; color: #555;
+                   background: rgba(255,255,255,0.9); border: 1px solid #ddd; border-radius: 20px; padding: 4px 10px; }
+        .lod-bar button { border: none; background: none; padding: 3px 8px; border-radius: 12px; cursor: pointer; }
+        .lod-bar button.active { background: #0d6efd; color: white; }
+"""
+
+
+def _lod_html(div_id, lod):
+    """
+    LOD 控件与各级数据；lod[0] 是图中已有的最粗一级，其余每级为 (标签, {trace 下标: trace})
+    返回 (页面片段, {附属文件名: 内容})，附属文件由 save_html 写在页面旁
+    """
+    buttons = "".join(f'<button class="{"active" if i == 0 else ""}">{label}</button>'
+                      for i, (label, _) in enumerate(lod))
+    files = {}
+    for level, (_, traces) in enumerate(lod[1:], 1):
+        table = _ArrayTable()
+        update = table.collect({str(idx): trace if isinstance(trace, dict) else trace.to_plotly_json()
+                                for idx, trace in traces.items()})
+        spec = _to_json({"arrays": table.entries, "update": update})
+        files[f"{div_id}.lod{level}.js"] = f'(window.IrisLod = window.IrisLod || {{}})["{div_id}-{level}"] = {spec};\n'
+    html = f"""<style>{_LOD_CSS}</style>
+        <div id="{div_id}-lod" class="lod-bar">Detail: {buttons}</div>
+        <script type="text/javascript">{_LOD_JS % {"div_id": div_id}}</script>"""
+    return html, files
+
+
+def compact_plot_html(fig, div_id, lod=None):
+    """
+    紧凑模式下的 fig.to_html(full_html=False, include_plotlyjs='cdn') 替代品，返回 (页面片段, {附属文件名: 内容})
+    lod: [(标签, {}), (标签, {trace 下标: 该级的 trace}), ...]，从粗到细；页面先显示 fig 本身 (第一级)，
+    更细的级别写成附属文件，按需加载切换 (只替换给出的 trace 中的属性)
+    """
+    table = _ArrayTable()
+    fig_json = fig.to_plotly_json()
+    data, layout = table.collect(fig_json["data"]), table.collect(fig_json["layout"])
+    spec = _to_json({"arrays": table.entries, "data": data, "layout": layout})
+    lod_html, files = _lod_html(div_id, lod) if lod else ("", {})
+    return f"""<div>
+        <script type="text/javascript">window.PlotlyConfig = {{MathJaxConfig: 'local'}};</script>
+        <script charset="utf-8" src="{plotly_src(get_plotlyjs_version())}"></script>
+        <div id="{div_id}" class="plotly-graph-div" style="height:100%; width:100%;"></div>
+        <script type="application/json" id="{div_id}-spec">{spec}</script>
+        <script type="text/javascript">{_COMPACT_JS % {"div_id": div_id}}</script>{lod_html}
+    </div>""", files
+
+
+def save_html(fig, filename, title, compact=True, lod=None):
+    """
+    保存HTML，并添加原生的悬浮返回按钮
+    compact=True (默认) 时数组以紧凑的二进制形式写入，见 compact_plot_html；False 时用 plotly 原生输出
+    lod: 多分辨率级别 (见 compact_plot_html)，只在紧凑模式下生效；plotly 原生输出只包含第一级
+         更细的级别写成页面旁的 <页面名>.lod<N>.js (见 incremental.companion_paths)
+    """
     fig.update_layout(
         title=dict(text=title, x=0.5, y=0.98),
         height=950,
@@ -73,7 +682,16 @@ def save_html(fig, filename, title):
         margin=dict(t=60)
     )
 
-    plot_html = fig.to_html(full_html=False, include_plotlyjs='cdn')
+    # 固定 div_id (默认是随机 uuid)，保证同样的输入生成逐字节相同的页面
+    div_id = os.path.splitext(os.path.basename(filename))[0]
+    files = {}
+    with span("to_html", compact=compact):
+        if compact:
+            plot_html, files = compact_plot_html(fig, div_id, lod)
+        else:
+            # 离线模式下引用输出目录中的共享副本 (以 .js 结尾的字符串按 src 引用)
+            plotlyjs = plotly_src(get_plotlyjs_version()) if offline() else 'cdn'
+            plot_html = fig.to_html(full_html=False, include_plotlyjs=plotlyjs, div_id=div_id)
 
     html_content = f"""
     <!DOCTYPE html>
@@ -101,6 +719,1190 @@ def save_html(fig, filename, title):
     </html>
     """
 
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    print(f"✅ Generated: {filename} (Fixed Navigation)")
\ No newline at end of file
+    path = output_path(filename)
+    with span("write_html", bytes=len(html_content)):
+        written = set()
+        for name, text in files.items():  # 附属文件先写，页面出现时它们已经就绪
+            written.update(write_page(os.path.join(os.path.dirname(path), name), text))
+        write_page(path, html_content)
+        for stale in set(companion_paths(filename)) - written:  # 上次构建留下的多余级别 (含其预压缩版本)
+            os.remove(stale)
+    print(f"✅ Generated: {path} (Fixed Navigation)")
+
+
+# === 5. 拟合模型缓存 (进程内 LRU + 磁盘层) ===
+# 任务二/三 (binary=True) 与任务四 A/B (binary=False) 在相同数据上拟合相同的管道
+# 磁盘层默认在 .iris_cache/models，进程池中的各个 worker 共享拟合结果：同一模型由第一个 worker 拟合
+# (持有 <键>.pkl.lock)，同时需要它的其他 worker 等待其写出结果，每次构建每个模型只拟合一次。
+# 环境变量 IRIS_MODEL_CACHE_DIR 指定目录，设为空字符串则禁用
+MODEL_CACHE_SIZE = 32                    # 进程内最多保留的模型个数
+MODEL_CACHE_DISK_BYTES = 256 * 1024 ** 2  # 磁盘层总大小上限，超出后按最近使用时间淘汰
+MODEL_FIT_WAIT = 120                      # 锁文件超过这么多秒未释放视为持有者已退出
+_model_cache = OrderedDict()
+
+
+def _hash_array(h, arr):
+    arr = np.ascontiguousarray(arr)
+    h.update(f"{arr.dtype.str}{arr.shape}".encode())
+    h.update(arr.tobytes())
+
+
+def model_fingerprint(X, y, model):
+    """(X, y, 管道参数, sklearn 版本) 的 sha256 指纹，用作模型缓存的键"""
+    h = hashlib.sha256()
+    _hash_array(h, X)
+    _hash_array(h, y)
+    params = sorted((k, repr(v)) for k, v in model.get_params(deep=True).items())
+    h.update(f"{type(model).__name__}{params}{sklearn.__version__}".encode())
+    return h.hexdigest()
+
+
+def _model_cache_dir():
+    return os.environ.get("IRIS_MODEL_CACHE_DIR", os.path.join(".iris_cache", "models")) or None
+
+
+def _claim_fit(path):
+    """
+    磁盘层的跨进程去重：返回 True 表示由本进程拟合 (已创建 <path>.lock，拟合写出后由调用方删除)，
+    False 表示结果已在磁盘上；其他进程正在拟合时等待
+    """
+    lock = f"{path}.lock"
+    while not os.path.exists(path):
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                if time.time() - os.stat(lock).st_mtime > MODEL_FIT_WAIT:
+                    os.remove(lock)  # 持有者已经退出 (崩溃或被终止)，锁失效
+            except FileNotFoundError:
+                pass  # 持有者刚好写完并释放
+            time.sleep(0.01)
+            continue
+        if os.path.exists(path):  # 检查与加锁之间，其他进程已经写出并释放
+            os.remove(lock)
+            return False
+        return True
+    return False
+
+
+def _evict_disk_cache(cache_dir, suffix, max_bytes):
+    """按最近使用时间 (mtime) 淘汰，直到目录总大小不超过 max_bytes"""
+    entries = []
+    for f in os.listdir(cache_dir):
+        if f.endswith(suffix):
+            try:
+                st = os.stat(os.path.join(cache_dir, f))
+            except FileNotFoundError:  # 其他 worker 刚刚淘汰了它
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+    total = 0
+    for mtime, size, f in sorted(entries, reverse=True):
+        total += size
+        if total > max_bytes:
+            try:
+                os.remove(os.path.join(cache_dir, f))
+            except FileNotFoundError:
+                pass
+
+
+def fit_model(X, y, model):
+    """
+    拟合模型并缓存；命中缓存时直接返回已拟合的估计器 (不要原地修改它)
+    查找顺序：进程内 LRU -> 磁盘层 -> 真正拟合
+    """
+    key = model_fingerprint(X, y, model)
+    if key in _model_cache:
+        _model_cache.move_to_end(key)
+        return _model_cache[key]
+
+    cache_dir = _model_cache_dir()
+    path = os.path.join(cache_dir, f"{key}.pkl") if cache_dir else None
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+    owner = bool(path) and _claim_fit(path)
+    try:
+        if path and not owner:
+            with open(path, "rb") as f:
+                model = pickle.load(f)
+            os.utime(path)  # 刷新最近使用时间
+        else:
+            if not _fit_shared(X, y, model):
+                with span("fit", estimator=type(model.steps[-1][1] if hasattr(model, "steps") else model).__name__):
+                    model.fit(X, y)
+            if path:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)  # 原子写入，并发 worker 不会读到半个文件
+                _evict_disk_cache(cache_dir, ".pkl", MODEL_CACHE_DISK_BYTES)
+    finally:
+        if owner:
+            os.remove(f"{path}.lock")
+
+    _model_cache[key] = model
+    while len(_model_cache) > MODEL_CACHE_SIZE:
+        _model_cache.popitem(last=False)
+    return model
+
+
+def clear_model_cache(disk=True):
+    """显式失效：清空进程内缓存 (含共享预处理)，disk=True 时同时删除磁盘层"""
+    _model_cache.clear()
+    _scaler_cache.clear()
+    _scaled_grid_cache.clear()
+    cache_dir = _model_cache_dir()
+    if disk and cache_dir and os.path.isdir(cache_dir):
+        for f in os.listdir(cache_dir):
+            if f.endswith(".pkl"):
+                os.remove(os.path.join(cache_dir, f))
+
+
+# === 6. 网格预测缓存 (磁盘, 可内存映射的 .npy) ===
+# 只改 save_html 样式或 trace 设置时，热重建无需重新拟合与预测
+# 键 = 模型指纹 + 网格内容 (范围/分辨率/dtype) + 预测方法 + numpy/sklearn 版本
+# 环境变量 IRIS_GRID_CACHE_DIR 指定目录，设为空字符串则禁用
+GRID_CACHE_DISK_BYTES = 2 * 1024 ** 3
+
+
+def _grid_cache_dir():
+    return os.environ.get("IRIS_GRID_CACHE_DIR", os.path.join(".iris_cache", "grids")) or None
+
+
+def grid_cache_key(X, y, model, grid, method):
+    h = hashlib.sha256()
+    h.update(model_fingerprint(X, y, model).encode())
+    axes = _grid_axes(grid)
+    for arr in (axes if axes is not None else [grid]):
+        _hash_array(h, arr)
+    h.update(f"{method}{np.__version__}{sklearn.__version__}".encode())
+    return h.hexdigest()
+
+
+def predict_grid(X, y, model, grid, method="predict_proba"):
+    """
+    在网格上执行 model.<method>，结果按 (模型, 网格) 对缓存到磁盘
+    grid 可以是 (N, d) 点阵、GridSpec，或坐标轴元组 (按 np.meshgrid 默认顺序展开，不会整体物化)
+    命中时以只读 memmap 返回，不再拟合；未命中时经 fit_model 拟合后分块计算，直接流式写入缓存文件
+    """
+    cache_dir = _grid_cache_dir()
+    if cache_dir:
+        path = os.path.join(cache_dir, grid_cache_key(X, y, model, grid, method) + ".npy")
+        try:
+            result = np.load(path, mmap_mode="r")
+            os.utime(path)  # 刷新最近使用时间
+            return result
+        except (FileNotFoundError, ValueError):  # 未命中或文件损坏，重新计算
+            pass
+
+    model = fit_model(X, y, model)
+    if not cache_dir:
+        return evaluate_chunked(model, grid, method)[0]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    result, stats = evaluate_chunked(model, grid, method, out_path=tmp_path)
+    result.flush()
+    del result
+    os.replace(tmp_path, path)
+    _evict_disk_cache(cache_dir, (".npy", ".npz"), GRID_CACHE_DISK_BYTES)
+    return np.load(path, mmap_mode="r")
+
+
+# 统一网格求值：每个 (模型, 网格) 只做一次 predict_proba (经上面的缓存)，其余结果都由概率推出
+# 标签语义：labels = classes[argmax(probs)]，并列时取编号较小的类别；不调用 model.predict。
+#   LogisticRegression / GaussianNB / KNN (uniform 权重) 的 predict 与此相同；SVC(probability=True)
+#   的 predict 按 decision_function 投票，可能与 Platt 校准后概率的 argmax 不一致，这里统一以概率为准，
+#   保证决策区域、概率图与 P=0.5 等值面互相吻合
+# margin: 最大与第二大概率之差 (二分类时即 |2p - 1|)，与 scatter_keep 的 "边界附近" 是同一个量
+# boundary: 结构化网格 (GridSpec / 坐标轴元组) 上与任一轴向相邻点标签不同的点；(N, d) 点阵时为 None
+# 各字段都按网格展平顺序排列 (与 predict_grid 相同)，classes 为标签可能的取值
+GridEvaluation = namedtuple("GridEvaluation", "probs labels margin boundary classes")
+
+
+def probability_margin(probs):
+    """最大与第二大概率之差 (只有一个类别时为该类的概率)"""
+    if probs.shape[1] == 1:
+        return np.asarray(probs[:, 0])
+    top2 = np.partition(probs, -2, axis=1)[:, -2:]
+    return top2[:, 1] - top2[:, 0]
+
+
+def _label_boundary(labels):
+    """labels (网格形状) 中与任一轴向相邻点取值不同的位置"""
+    edge = np.zeros(labels.shape, dtype=bool)
+    for axis in range(labels.ndim):
+        diff = np.diff(labels, axis=axis) != 0
+        lo = [slice(None)] * labels.ndim
+        hi = list(lo)
+        lo[axis], hi[axis] = slice(None, -1), slice(1, None)
+        edge[tuple(lo)] |= diff
+        edge[tuple(hi)] |= diff
+    return edge
+
+
+def evaluate_grid(X, y, model, grid):
+    """
+    一次求值得到网格上的概率、标签、margin 与边界掩码 (语义见上)，返回 GridEvaluation
+    grid 的形式与 predict_grid 相同；各任务都从这里取网格结果，不再分别调用 predict / predict_proba
+    """
+    probs = predict_grid(X, y, model, grid, "predict_proba")
+    classes = np.unique(y)  # 与 sklearn 的 classes_ 相同，缓存命中时不必拟合
+    labels = classes[np.argmax(probs, axis=1)]
+    axes = _grid_axes(grid)
+    boundary = None if axes is None else _label_boundary(labels.reshape(grid_shape(axes))).ravel()
+    return GridEvaluation(probs, labels, probability_margin(probs), boundary, classes)
+
+
+def cached_arrays(key, compute):
+    """
+    通用版本：compute() 返回 {名称: 数组} (例如八叉树提取的边界网格)，以 .npz 缓存
+    key 由调用方给出，应包含模型指纹与全部影响结果的参数
+    """
+    cache_dir = _grid_cache_dir()
+    if cache_dir:
+        h = hashlib.sha256(f"{key}{np.__version__}{sklearn.__version__}".encode())
+        path = os.path.join(cache_dir, h.hexdigest() + ".npz")
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                result = {k: data[k] for k in data.files}
+            os.utime(path)
+            return result
+        except (FileNotFoundError, ValueError, OSError):
+            pass
+
+    result = compute()
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **result)
+        os.replace(tmp_path, path)
+        _evict_disk_cache(cache_dir, (".npy", ".npz"), GRID_CACHE_DISK_BYTES)
+    return result
+
+
+def boundary_mesh(X, y, model, threshold=0.5, cls=1, base=8, depth=3):
+    """
+    用八叉树自适应采样提取 P(cls) == threshold 的决策面 (结果缓存)
+    默认等效分辨率 8 * 2**3 + 1 = 65；depth=4/5 可达 129³/257³，预测次数只与边界面积成正比
+    返回 dict(vertices, faces)，可直接用于 go.Mesh3d
+    """
+    def compute():
+        fitted = fit_model(X, y, model)
+        mins, maxs = get_bounds(X[:, :3])
+        with span("boundary_mesh", depth=depth):
+            mesh = refine_boundary(lambda pts: fitted.predict_proba(pts)[:, cls],
+                                   mins, maxs, base=base, depth=depth, threshold=threshold)
+        return {"vertices": mesh["vertices"], "faces": mesh["faces"]}
+
+    # 键中的 "tet" 标明四面体剖分 (tet_surface) 得到的网格：提取算法改变时换掉，旧缓存不再命中
+    key = f"octree-tet{model_fingerprint(X, y, model)}{threshold}{cls}{base}{depth}"
+    return cached_arrays(key, compute)
+
+
+def clear_grid_cache():
+    """显式失效：删除所有已缓存的网格预测结果"""
+    cache_dir = _grid_cache_dir()
+    if cache_dir and os.path.isdir(cache_dir):
+        for f in os.listdir(cache_dir):
+            if f.endswith((".npy", ".npz")):
+                os.remove(os.path.join(cache_dir, f))
+
+
+# === 7. 分块网格求值 (内存上限可控) ===
+# 网格点按固定大小的块生成、求值，结果写入预分配的输出 (可为 memmap)
+# KNN / SVC 会按块分配 距离矩阵 / 核矩阵，块大小由内存预算推算，实测超出时自动减半
+# 环境变量 IRIS_MEMORY_BUDGET_MB 设置单次求值的内存预算 (默认 256 MB)
+MEMORY_BUDGET = int(os.environ.get("IRIS_MEMORY_BUDGET_MB", 256)) * 1024 ** 2
+EVAL_STATS = []  # 每次分块求值的统计 (点数、块数、块大小、峰值内存、预算)
+
+
+def grid_shape(axes):
+    """坐标轴按 np.meshgrid 默认 'xy' 索引展开后的形状 (前两轴互换)"""
+    shape = [len(a) for a in axes]
+    shape[0], shape[1] = shape[1], shape[0]
+    return tuple(shape)
+
+
+def grid_points_at(grid, flat_idx):
+    """展平网格中下标为 flat_idx 的点；grid 为 GridSpec / 坐标轴元组时只生成这些点"""
+    axes = _grid_axes(grid)
+    if axes is None:
+        return grid[flat_idx]
+    idx = list(np.unravel_index(flat_idx, grid_shape(axes)))
+    idx[0], idx[1] = idx[1], idx[0]
+    return np.stack([axis[i] for axis, i in zip(axes, idx)], axis=1)
+
+
+def grid_rows(grid, start, stop):
+    """取出展平网格的第 [start, stop) 个点；grid 为 GridSpec / 坐标轴元组时只生成这一块"""
+    if _grid_axes(grid) is None:
+        return grid[start:stop]
+    return grid_points_at(grid, np.arange(start, stop))
+
+
+def _row_bytes(model, n_features):
+    """估算每个网格点求值时的内存占用：坐标与输出副本 + 与参考样本的 距离/核 行"""
+    est = model.steps[-1][1] if hasattr(model, "steps") else model
+    n_ref = 0
+    for attr in ("support_vectors_", "_fit_X"):
+        if hasattr(est, attr):
+            n_ref = len(getattr(est, attr))
+    return 8 * (4 * n_features + 16 + 2 * n_ref)
+
+
+def evaluate_chunked(model, grid, method="predict_proba", memory_budget=None, out_path=None):
+    """
+    分块执行 model.<method>，返回 (结果, 统计)
+    out_path 非空时结果直接写入该路径下的 .npy memmap，不占用进程内存
+    每块的实际峰值由 tracemalloc 测量；超出预算则后续块减半，统计里记录峰值与是否达标
+    """
+    budget = memory_budget or MEMORY_BUDGET
+    axes = _grid_axes(grid)
+    n_points = prod(grid_shape(axes)) if axes else len(grid)
+    n_features = len(axes) if axes else grid.shape[1]
+    chunk = max(1, budget // _row_bytes(model, n_features))
+
+    # 线性 / 朴素贝叶斯管道在笛卡尔网格上有闭式解，KNN 可按块复用近邻集合：都按整行 (最慢的一维) 切块
+    fast = fast_grid_evaluator(model, axes, method) if axes else None
+    row = n_points // grid_shape(axes)[0] if fast else 1
+    chunk = max(row, chunk // row * row)
+    # 通用路径：标准化只在坐标轴上做一次 (所有模型共用)，逐块只调用最终估计器
+    est, rows = model, grid
+    shared = None if fast else shared_grid(model, axes)
+    if shared:
+        est, rows = shared
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    out, peak, n_chunks, start = None, 0, 0, 0
+    try:
+        # sklearn 内部的成对距离计算也按同一预算分块
+        with sklearn.config_context(working_memory=max(1, budget // 2 // 1024 ** 2)):
+            while start < n_points:
+                stop = min(start + chunk, n_points)
+                base = tracemalloc.get_traced_memory()[0]
+                reset_peak()
+                with span(method, points=stop - start, evaluator=fast.kind if fast else "generic"):
+                    if fast:
+                        res = fast(start // row, stop // row)
+                    else:
+                        res = getattr(est, method)(grid_rows(rows, start, stop))
+                used = tracemalloc.get_traced_memory()[1] - base
+                peak, n_chunks = max(peak, used), n_chunks + 1
+                if used > budget and chunk > row:
+                    chunk = max(row, chunk // 2 // row * row)
+
+                if out is None:
+                    shape = (n_points,) + res.shape[1:]
+                    if out_path:
+                        out = np.lib.format.open_memmap(out_path, mode="w+", dtype=res.dtype, shape=shape)
+                    else:
+                        out = np.empty(shape, dtype=res.dtype)
+                out[start:stop] = res
+                start = stop
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    if fast and not _matches_generic(model, grid, method, out):
+        print(f"⚠️ Fast {fast.kind} {method} disagrees with sklearn, falling back to generic evaluation")
+        return evaluate_chunked(_GenericOnly(model), grid, method, memory_budget, out_path)
+
+    stats = {"method": method, "points": n_points, "chunks": n_chunks, "chunk_size": chunk,
+             "peak_bytes": peak, "budget_bytes": budget, "within_budget": peak <= budget,
+             "evaluator": fast.kind if fast else "generic"}
+    EVAL_STATS.append(stats)
+    if not stats["within_budget"]:
+        print(f"⚠️ Grid evaluation peaked at {peak / 1024 ** 2:.1f} MB "
+              f"(budget {budget / 1024 ** 2:.0f} MB, {n_points} points)")
+    return out, stats
+
+
+# === 8. 服务端等值面提取 (向量化 Marching Cubes) ===
+# 在 Python 端把概率场提取成三角网格 (go.Mesh3d)，页面不再内嵌整个网格，浏览器也不必自己跑等值面
+# 每个立方体沿主对角线切成 6 个四面体 (marching tetrahedra 变体)：每个四面体只有 16 种情况，
+# 没有经典 256 表的二义性，得到的网格无裂缝
+_CUBE = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                  [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]])
+_TETS = np.array([[0, 1, 2, 6], [0, 2, 3, 6], [0, 3, 7, 6],
+                  [0, 7, 4, 6], [0, 4, 5, 6], [0, 5, 1, 6]])
+_TET_EDGES = np.array([[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 3]])
+
+
+def _tet_table():
+    """16 种情况 -> 最多 2 个三角形 (用四面体的棱编号表示，-1 表示无)"""
+    edge_of = {tuple(e): i for i, e in enumerate(_TET_EDGES.tolist())}
+    edge = lambda a, b: edge_of[(min(a, b), max(a, b))]
+    table = np.full((16, 2, 3), -1)
+    for code in range(1, 15):
+        inside = [v for v in range(4) if code >> v & 1]
+        outside = [v for v in range(4) if not code >> v & 1]
+        if len(inside) in (1, 3):  # 一个孤立顶点：切下一个角
+            lone = inside[0] if len(inside) == 1 else outside[0]
+            others = [v for v in range(4) if v != lone]
+            table[code, 0] = [edge(lone, o) for o in others]
+        else:  # 2 + 2：四边形切成两个三角形
+            (a, b), (c, d) = inside, outside
+            quad = [edge(a, c), edge(a, d), edge(b, d), edge(b, c)]
+            table[code, 0] = quad[:3]
+            table[code, 1] = [quad[0], quad[2], quad[3]]
+    return table
+
+
+_TET_TABLE = _tet_table()
+
+
+def tet_surface(cells, values_at, shape, level):
+    """
+    立方体单元 -> values == level 的三角网格 (格点坐标)；marching_cubes 与 octree.refine_boundary 共用
+    cells: (C, 3) 各单元低端角点的整数格点坐标；values_at(ijk): 整数格点 (..., 3) 上的值
+    shape: 格点阵列的形状 (用于全局棱编号)
+    返回 (ijk (V, 3) 浮点格点坐标, faces (F, 3))：共享棱上的顶点已去重，三角形法向指向 values < level 的一侧
+    """
+    n = np.asarray(shape)
+    # 1. 每个立方体拆成 6 个四面体，按 16 种情况查表
+    tet_pts = cells[:, None, None, :] + _CUBE[_TETS]                       # (C, 6, 4, 3)
+    tet_pts = tet_pts.reshape(-1, 4, 3)
+    tet_vals = values_at(tet_pts)                                         # (T, 4)
+    codes = ((tet_vals >= level) * (1 << np.arange(4))).sum(axis=1)
+    tris = _TET_TABLE[codes].reshape(-1, 3)                                # (T*2, 3) 棱编号
+    tet_idx = np.repeat(np.arange(len(codes)), 2)
+    keep = tris[:, 0] >= 0
+    tris, tet_idx = tris[keep], tet_idx[keep]
+
+    # 2. 三角形顶点 = 四面体棱上的线性插值点；按全局棱编号去重
+    pa = tet_pts[tet_idx[:, None], _TET_EDGES[tris, 0]]                  # (F, 3, 3)
+    pb = tet_pts[tet_idx[:, None], _TET_EDGES[tris, 1]]
+    lin = lambda p: (p[..., 0] * n[1] + p[..., 1]) * n[2] + p[..., 2]
+    swap = lin(pa) > lin(pb)
+    pa, pb = np.where(swap[..., None], pb, pa), np.where(swap[..., None], pa, pb)
+    d = pb - pa
+    edge_ids = lin(pa) * 8 + d[..., 0] * 4 + d[..., 1] * 2 + d[..., 2]
+    uniq, first, faces = np.unique(edge_ids.ravel(), return_index=True, return_inverse=True)
+
+    pa, pb = pa.reshape(-1, 3)[first], pb.reshape(-1, 3)[first]
+    va, vb = values_at(pa), values_at(pb)
+    t = np.clip((level - va) / (vb - va), 0.0, 1.0)[:, None]
+    ijk = pa + t * (pb - pa)
+
+    # 3. 统一朝向 (查表得到的三角形绕向不定)：法向指向区域外，即沿 -∇values
+    #    四面体内的等值面就是线性插值的平面，"外侧角点均值 - 内侧角点均值" 与 -∇values 同向
+    faces = faces.reshape(-1, 3)
+    inside = (tet_vals[tet_idx] >= level)[..., None]                     # (F, 4, 1)
+    corners = tet_pts[tet_idx]
+    outward = (corners * ~inside).sum(axis=1) / (~inside).sum(axis=1) - \
+        (corners * inside).sum(axis=1) / inside.sum(axis=1)
+    tri = ijk[faces]
+    normal = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    flip = np.einsum("ij,ij->i", normal, outward) < 0
+    faces[flip] = faces[flip][:, ::-1]
+
+    return ijk, faces
+
+
+def marching_cubes(axes, values, level, closed=False):
+    """
+    提取 values == level 的等值面
+    axes: (x, y, z) 坐标轴；values: 按 np.meshgrid 默认顺序展平的标量场 (即 predict_grid 的输出)
+    closed=True 时在体外补一圈低于 level 的值，使区域在网格边界处封口 (类似 Volume 的 caps)
+    返回 dict(vertices=(V, 3) float32, faces=(F, 3) int32)，共享棱上的顶点已去重
+    """
+    vol = np.asarray(values, dtype=float).reshape(grid_shape(axes)).transpose(1, 0, 2)  # (nx, ny, nz)
+    mins = np.array([a[0] for a in axes])
+    maxs = np.array([a[-1] for a in axes])
+    step = (maxs - mins) / (np.array(vol.shape) - 1)
+    if closed:
+        vol = np.pad(vol, 1, constant_values=min(vol.min(), level) - 1)
+        mins = mins - step
+    n = np.array(vol.shape)
+
+    # 1. 只处理角点跨越 level 的立方体
+    above = vol >= level
+    sub = lambda a, c: a[c[0]:n[0] - 1 + c[0], c[1]:n[1] - 1 + c[1], c[2]:n[2] - 1 + c[2]]
+    n_above = sum(sub(above, c).astype(np.int8) for c in _CUBE)
+    cells = np.argwhere((n_above > 0) & (n_above < 8))
+    if cells.size == 0:
+        return {"vertices": np.empty((0, 3), dtype=np.float32), "faces": np.empty((0, 3), dtype=np.int32)}
+
+    # 2. 每个活跃立方体拆成 6 个四面体查表，三角形统一朝外 (见 tet_surface)
+    ijk, faces = tet_surface(cells, lambda p: vol[p[..., 0], p[..., 1], p[..., 2]], vol.shape, level)
+
+    # 格点坐标 -> 世界坐标 (坐标轴等距)；封口面落在补出的半格里，压回到网格边界上
+    vertices = np.clip(mins + ijk * step, [a[0] for a in axes], maxs).astype(np.float32)
+    return {"vertices": vertices, "faces": faces.astype(np.int32)}
+
+
+def isosurface_mesh(axes, values, levels):
+    """
+    多个等值面合并成一个网格；intensity 记录每个顶点所在的 level，
+    配合 go.Mesh3d 的 colorscale / cmin / cmax 着色，效果等同于 go.Isosurface 的 surface_count
+    """
+    parts = [marching_cubes(axes, values, lv) for lv in levels]
+    offsets = np.cumsum([0] + [len(p["vertices"]) for p in parts])
+    return {
+        "vertices": np.concatenate([p["vertices"] for p in parts]),
+        "faces": np.concatenate([p["faces"] + off for p, off in zip(parts, offsets)]).astype(np.int32),
+        "intensity": np.concatenate([np.full(len(p["vertices"]), lv, dtype=np.float32)
+                                     for p, lv in zip(parts, levels)]),
+    }
+
+
+# --- 2D：marching squares (任务一的决策区域与概率分级) ---
+# 与 marching_cubes 相同的约定，输出有方向的折线：区域 (>= level) 总在行进方向左侧，
+# 外轮廓逆时针、洞顺时针，配合 fill='toself' 由浏览器直接填充成带洞的多边形
+_SQUARE = np.array([[0, 0], [1, 0], [1, 1], [0, 1]])  # 单元角点 (i, j)，逆时针；棱 e 连接角点 e 与 e+1
+
+
+def _square_table():
+    """(16 种情况, 单元中心是否 >= level) -> 最多 2 条有向线段 (用单元的棱编号表示，-1 表示无)"""
+    mid = (_SQUARE + np.roll(_SQUARE, -1, axis=0)) / 2
+    table = np.full((16, 2, 2, 2), -1)
+    for code in range(1, 15):
+        inside = [bool(code >> c & 1) for c in range(4)]
+        crossed = [e for e in range(4) if inside[e] != inside[(e + 1) % 4]]
+        for center in (0, 1):
+            if len(crossed) == 2:
+                pairs = [crossed]
+            else:  # 鞍点 (5 / 10)：中心在内时对角的内点相连，切下两个外角；否则切下两个内角
+                pairs = [[(c - 1) % 4, c] for c in range(4) if inside[c] != bool(center)]
+            for s, (a, b) in enumerate(pairs):
+                # 棱 a 上位于区域内的角点必须落在 a -> b 的左侧
+                p = _SQUARE[a] if inside[a] else _SQUARE[(a + 1) % 4]
+                d, q = mid[b] - mid[a], p - mid[a]
+                table[code, center, s] = [a, b] if d[0] * q[1] - d[1] * q[0] > 0 else [b, a]
+    return table
+
+
+_SQUARE_TABLE = _square_table()
+
+
+def _simplify(pts, tolerance):
+    """Douglas-Peucker 折线简化 (闭合路径首尾点相同，弦长为 0 时按到该点的距离)"""
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        chord, rel = pts[b] - pts[a], pts[a + 1:b] - pts[a]
+        length = np.hypot(*chord)
+        dist = (np.abs(chord[0] * rel[:, 1] - chord[1] * rel[:, 0]) / length if length > 0
+                else np.hypot(rel[:, 0], rel[:, 1]))
+        k = int(dist.argmax())
+        if dist[k] > tolerance:
+            keep[a + 1 + k] = True
+            stack += [(a, a + 1 + k), (a + 1 + k, b)]
+    return pts[keep]
+
+
+def marching_squares(axes, values, level, closed=False, tolerance=0.0):
+    """
+    提取 values == level 的等值线 (marching_cubes 的 2D 版本)
+    axes: (x, y) 坐标轴；values: 按 np.meshgrid 默认顺序展平的标量场
+    closed=True 时在网格外补一圈低于 level 的值，使区域在网格边界处封口 (所有路径都闭合)
+    tolerance > 0 时以 Douglas-Peucker 简化路径，单位为网格步长
+    返回 dict(x, y) float32：路径之间以 NaN 分隔 (plotly 的断线约定)，闭合路径首尾点相同
+    """
+    img = np.asarray(values, dtype=float).reshape(grid_shape(axes)).T  # (nx, ny)
+    mins = np.array([a[0] for a in axes])
+    maxs = np.array([a[-1] for a in axes])
+    step = (maxs - mins) / (np.array(img.shape) - 1)
+    if closed:
+        img = np.pad(img, 1, constant_values=min(img.min(), level) - 1)
+        mins = mins - step
+    n = np.array(img.shape)
+
+    # 1. 只处理角点跨越 level 的单元；鞍点再按单元中心的均值决定连通方式
+    above = img >= level
+    sub = lambda a, c: a[c[0]:n[0] - 1 + c[0], c[1]:n[1] - 1 + c[1]]
+    codes = sum(sub(above, c).astype(np.int8) << k for k, c in enumerate(_SQUARE))
+    cells = np.argwhere((codes > 0) & (codes < 15))
+    if cells.size == 0:
+        return {"x": np.empty(0, dtype=np.float32), "y": np.empty(0, dtype=np.float32)}
+    corners = cells[:, None, :] + _SQUARE                                  # (C, 4, 2)
+    center = img[corners[..., 0], corners[..., 1]].mean(axis=1) >= level
+    segs = _SQUARE_TABLE[codes[cells[:, 0], cells[:, 1]], center.astype(int)].reshape(-1, 2)
+    cell_idx = np.repeat(np.arange(len(cells)), 2)
+    keep = segs[:, 0] >= 0
+    segs, cell_idx = segs[keep], cell_idx[keep]
+
+    # 2. 线段端点 = 棱上的线性插值点；按全局棱编号 (较小角点的线性下标 * 2 + 方向) 去重
+    pa = cells[cell_idx, None, :] + _SQUARE[segs]                         # (S, 2, 2)
+    pb = cells[cell_idx, None, :] + _SQUARE[(segs + 1) % 4]
+    lo = np.minimum(pa, pb)
+    edge_ids = (lo[..., 0] * n[1] + lo[..., 1]) * 2 + (pa[..., 1] != pb[..., 1])
+    uniq, first, ends = np.unique(edge_ids.ravel(), return_index=True, return_inverse=True)
+    ends = ends.reshape(-1, 2)
+    pa, pb = pa.reshape(-1, 2)[first], pb.reshape(-1, 2)[first]
+    va, vb = img[pa[:, 0], pa[:, 1]], img[pb[:, 0], pb[:, 1]]
+    t = np.clip((level - va) / (vb - va), 0.0, 1.0)[:, None]
+    ij = pa + t * (pb - pa)
+
+    # 3. 每条棱至多是一条线段的起点、一条线段的终点：沿 起点 -> 终点 串成路径
+    #    (开放路径从没有前驱的棱出发，剩下的都是环)
+    nxt = np.full(len(uniq), -1)
+    nxt[ends[:, 0]] = ends[:, 1]
+    has_prev = np.zeros(len(uniq), dtype=bool)
+    has_prev[ends[:, 1]] = True
+    nxt, seen, parts = nxt.tolist(), [False] * len(uniq), []
+    for start in np.flatnonzero(~has_prev).tolist() + list(range(len(uniq))):
+        if seen[start]:
+            continue
+        path, node = [], start
+        while node >= 0 and not seen[node]:
+            seen[node] = True
+            path.append(node)
+            node = nxt[node]
+        if node == start:
+            path.append(start)
+        pts = ij[path]
+        if tolerance > 0 and len(pts) > 2:
+            pts = _simplify(pts, tolerance)
+        parts += [pts, np.full((1, 2), np.nan)]
+
+    # 格点坐标 -> 世界坐标；封口线落在补出的半格里，压回到网格边界上
+    xy = np.clip(mins + np.concatenate(parts[:-1]) * step, [a[0] for a in axes], maxs).astype(np.float32)
+    return {"x": xy[:, 0], "y": xy[:, 1]}
+
+
+def mesh_trace(mesh, **kwargs):
+    """把 marching_cubes / isosurface_mesh / boundary_mesh 的结果包装成 Mesh3d trace (见 make_trace)"""
+    v, f = mesh["vertices"], mesh["faces"]
+    if "intensity" in mesh:
+        kwargs.setdefault("intensity", mesh["intensity"])
+    return make_trace("mesh3d", x=v[:, 0], y=v[:, 1], z=v[:, 2], i=f[:, 0], j=f[:, 1], k=f[:, 2],
+                      hoverinfo='skip', **kwargs)
+
+
+def path_trace(path, **kwargs):
+    """把 marching_squares 的结果包装成 2D 折线 trace (fill='toself' 时按路径方向填充带洞的区域)"""
+    return make_trace("scatter", x=path["x"], y=path["y"], mode='lines', hoverinfo='skip', **kwargs)
+
+
+# === 9. 网格结构感知的闭式求值 (LogisticRegression / GaussianNB) ===
+# 网格是坐标轴的笛卡尔积，StandardScaler 逐轴独立：
+#   - 逻辑回归的 logit = Σ_d w_d * x_d + b
+#   - 高斯朴素贝叶斯的 log 似然 = log π_c - ½Σ_d log(2πσ²_cd) - ½Σ_d (x_d - θ_cd)² / σ²_cd
+# 都是逐轴项之和：只需在每条一维坐标轴上算 O(n) 个项，再广播相加成整个体
+# 两类时 softmax 化为 logit 之差的 logistic (一列)；多类时逐类别就地做 softmax (见 _softmax_columns)
+# KNN 见第 10 节；SVC 以及非 "StandardScaler -> 估计器" 形式的管道走通用路径
+CLOSED_FORM_CHECK_POINTS = 64  # 随机抽查多少个点与 sklearn 的通用结果比对
+MATCH_EPS_FACTOR = 256  # 抽查容差 = 网格 dtype 的机器精度 × 该系数 (float32 约 3e-5；float64 下仍为 1e-9 / 1e-12)
+
+
+class _GenericOnly:
+    """包装一个估计器，使 fast_grid_evaluator 不再识别它 (抽查不一致时回退用)"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def _split_scaler(model, n_axes):
+    """
+    把 "(StandardScaler ->) 估计器" 拆成 (均值, 尺度, 估计器)；其他形式的管道返回 None
+    with_mean=False / with_std=False 时 mean_ / scale_ 仍可能被拟合出来，但 transform 不使用，这里同样按 0 / 1 处理
+    """
+    steps = [step for _, step in model.steps] if hasattr(model, "steps") else [model]
+    if len(steps) > 2 or (len(steps) == 2 and type(steps[0]) is not StandardScaler):
+        return None
+    if len(steps) == 2:
+        scaler = steps[0]
+        mean = scaler.mean_ if scaler.with_mean and scaler.mean_ is not None else np.zeros(n_axes)
+        scale = scaler.scale_ if scaler.with_std and scaler.scale_ is not None else np.ones(n_axes)
+    else:
+        mean, scale = np.zeros(n_axes), np.ones(n_axes)
+    return mean, scale, steps[-1]
+
+
+def _axis_terms(model, n_axes):
+    """
+    返回 (每轴的项函数, 偏置, 链接方式)；不支持时返回 None
+    项函数 term(d, values) -> (len(values), C)；logit = Σ_d term(d, x_d) + 偏置
+    """
+    parts = _split_scaler(model, n_axes)
+    if parts is None:
+        return None
+    mean, scale, est = parts
+
+    if type(est) is LogisticRegression:
+        coef, bias = est.coef_, est.intercept_
+        link = "logistic" if coef.shape[0] == 1 else "softmax"
+
+        def term(d, values):
+            return np.outer((values - mean[d]) / scale[d], coef[:, d])
+    elif type(est) is GaussianNB:
+        theta, var = est.theta_, est.var_
+        bias = np.log(est.class_prior_) - 0.5 * np.sum(np.log(2.0 * np.pi * var), axis=1)
+        link = "softmax"
+
+        def term(d, values):
+            x = ((values - mean[d]) / scale[d])[:, None]
+            return -0.5 * (x - theta[:, d]) ** 2 / var[:, d]
+
+        if len(bias) == 2:  # 两类的 softmax 就是两个 log 似然之差的 logistic：只需一列
+            two_class, bias, link = term, bias[1:] - bias[:1], "logistic"
+
+            def term(d, values):
+                t = two_class(d, values)
+                return t[:, 1:] - t[:, :1]
+    else:
+        return None
+    return term, bias, link
+
+
+def fast_grid_evaluator(model, axes, method):
+    """按估计器类型选择网格专用求值器 (闭式 / KNN 分块)，都不适用时返回 None"""
+    return closed_form_evaluator(model, axes, method) or knn_grid_evaluator(model, axes, method)
+
+
+def closed_form_evaluator(model, axes, method):
+    """
+    若 model 是 (StandardScaler ->) LogisticRegression / GaussianNB，返回 fast(r0, r1)：
+    计算展平网格第 r0..r1 行 (meshgrid 'xy' 顺序下最慢的一维) 的 model.<method> 结果；否则返回 None
+    """
+    if isinstance(model, _GenericOnly) or method not in ("predict_proba", "predict", "decision_function"):
+        return None
+    parts = _axis_terms(model, len(axes))
+    if parts is None:
+        return None
+    term, bias, link = parts
+    est = model.steps[-1][1] if hasattr(model, "steps") else model
+    if method == "decision_function" and type(est) is GaussianNB:
+        return None
+
+    # 'xy' 顺序：展开后的第 0 维是第 1 条坐标轴，第 1 维是第 0 条
+    order = [1, 0] + list(range(2, len(axes)))
+    terms = [term(d, np.asarray(axes[d], dtype=float)) for d in order]
+    ndim = len(axes)
+
+    def class_logits(c, r0, r1):
+        """第 c 个类别的 logit，一条连续数组 (只有最后一次广播相加分配整块内存)"""
+        z = bias[c]
+        for pos, t in enumerate(terms):
+            t = t[r0:r1, c] if pos == 0 else t[:, c]
+            shape = [1] * ndim
+            shape[pos] = len(t)
+            z = z + t.reshape(shape)
+        return z.reshape(-1)
+
+    def fast(r0, r1):
+        if link == "softmax" and method == "predict_proba":
+            return _softmax_columns([class_logits(c, r0, r1) for c in range(len(bias))])
+        logits = bias
+        for pos, t in enumerate(terms):
+            if pos == 0:
+                t = t[r0:r1]
+            shape = [1] * ndim + [t.shape[1]]
+            shape[pos] = t.shape[0]
+            logits = logits + t.reshape(shape)
+        logits = logits.reshape(-1, logits.shape[-1])
+
+        if link == "logistic":
+            z = logits[:, 0]
+            if method == "decision_function":
+                return z
+            if method == "predict":
+                return est.classes_[(z > 0).astype(int)]
+            with np.errstate(over="ignore"):  # exp 上溢为 inf 时 p = 0，与 scipy 的 expit 相同
+                p = 1.0 / (1.0 + np.exp(-z))
+            return np.stack([1 - p, p], axis=1)
+        if method == "decision_function":
+            return logits
+        return est.classes_[np.argmax(logits, axis=1)]
+
+    fast.kind = "closed_form"
+    return fast
+
+
+def _softmax_columns(logits):
+    """
+    每个类别一条 logit 数组 -> softmax 概率 (N, C)
+    逐类别在连续数组上就地计算 (减去最大值、exp、累加)，最后一次写入结果；
+    不在 (N, C) 上按行归约 (类别数很小时按行的 max / sum 远比逐列的逐元素运算慢)
+    """
+    top = logits[0].copy()
+    for z in logits[1:]:
+        np.maximum(top, z, out=top)
+    total = np.zeros_like(top)
+    for z in logits:
+        z -= top
+        np.exp(z, out=z)
+        total += z
+    out = np.empty((len(top), len(logits)), dtype=top.dtype)
+    for c, z in enumerate(logits):
+        np.divide(z, total, out=out[:, c])
+    return out
+
+
+def _matches_generic(model, grid, method, out):
+    """
+    随机抽查若干网格点，确认专用求值器 (闭式 / KNN 分块) 的结果与 sklearn 通用路径在数值上等价
+    专用求值器按 float64 计算；float32 网格上 sklearn 按 float32 坐标计算，容差按网格 dtype 的机器精度放宽
+    """
+    rng = np.random.default_rng(0)
+    idx = np.sort(rng.choice(len(out), size=min(CLOSED_FORM_CHECK_POINTS, len(out)), replace=False))
+    points = grid_points_at(grid, idx)
+    expected = getattr(model, method)(points)
+    if method == "predict":
+        return np.array_equal(np.asarray(out[idx]), expected)
+    eps = np.finfo(points.dtype if np.issubdtype(points.dtype, np.floating) else np.float64).eps
+    return np.allclose(out[idx], expected, rtol=max(1e-9, MATCH_EPS_FACTOR * eps),
+                       atol=max(1e-12, MATCH_EPS_FACTOR * eps))
+
+
+# === 10. KNN 网格求值 (按块复用近邻集合 + 多线程) ===
+# 取轴对齐块 B 的中心 c 的 k 个近邻 S。对 i ∈ S、j ∉ S，|p - x_i|² - |p - x_j|² 是 p 的线性函数，
+# 它在 B 上的最大值可由 "中心处的值 + Σ|系数|·半边长" 精确得到。
+# 若所有类别不同的 (i, j) 对在整块上都满足 x_i 严格更近，块内每一点的 k 近邻标签计数都与 S 相同，
+# 整块 predict_proba = S 的各类计数 / k (与 sklearn 逐点结果完全一致，重复样本 / 同类并列不影响)。
+# 只有距 c 不超过 d_k(c) + 2r (r 为块半对角线) 的点可能挤进近邻，因此 j 只需在这些候选里找。
+# 网格按 2 的幂边长的对齐方块自顶向下逐层判定，判定失败的块一分为 2^ndim；
+# 块太小 (判定一次不比逐点查询便宜) 时停止，剩余的点合并成一次 sklearn 调用。
+# 判定额外留出相对 eps 的余量，抵消舍入误差；按行切成若干批交给线程池 (树查询与 numpy 运算释放 GIL)
+KNN_MIN_GRID_POINTS = 1 << 18  # 小网格上 sklearn 逐点查询已经足够快，分块判定的开销不划算
+KNN_TOP_TILE = 16          # 最顶层方块的边长 (网格点数)
+KNN_MIN_TILE_POINTS = 32   # 小于这么多点的块不再判定，直接逐点查询
+KNN_CANDIDATES = 32        # 每块最多检查多少个 S 以外的候选点，候选更多时判为失败
+KNN_BATCH = 4096           # 每次向量化判定的块数 (限制 块数 × k × 候选数 的临时数组)
+KNN_EPS = 1e-9
+
+
+def knn_grid_evaluator(model, axes, method):
+    """
+    若 model 是 (StandardScaler ->) KNeighborsClassifier(weights='uniform', 欧氏距离)，返回 fast(r0, r1)：
+    计算展平网格第 r0..r1 行的 model.<method> 结果 (与 sklearn 逐点结果完全一致)；否则返回 None
+    """
+    if isinstance(model, _GenericOnly) or method not in ("predict_proba", "predict"):
+        return None
+    parts = _split_scaler(model, len(axes))
+    if parts is None:
+        return None
+    mean, scale, est = parts
+    if (type(est) is not KNeighborsClassifier or est.weights != "uniform" or est.outputs_2d_
+            or est.effective_metric_ != "euclidean" or est.n_neighbors >= len(est._fit_X)
+            or np.prod([len(a) for a in axes]) < KNN_MIN_GRID_POINTS):
+        return None
+
+    k, n_classes = est.n_neighbors, len(est.classes_)
+    fit_X, labels = est._fit_X, est._y
+    tree = KDTree(fit_X)
+    n_query = min(k + KNN_CANDIDATES, len(fit_X))
+    one_hot = np.eye(n_classes)
+    bias = (fit_X ** 2).sum(axis=1)
+    ndim = len(axes)
+
+    # 'xy' 顺序：展开后的第 0 维是第 1 条坐标轴，第 1 维是第 0 条
+    order = [1, 0] + list(range(2, ndim))
+    scaled = [(np.asarray(axes[d], dtype=float) - mean[d]) / scale[d] for d in order]
+    row_points = int(np.prod([len(s) for s in scaled[1:]]))
+
+    def certify(centers, half):
+        """centers / half: 块中心与半边长 (特征顺序)；返回每块的确定概率，无法确定的行为 NaN"""
+        out = np.full((len(centers), n_classes), np.nan)
+        for s in range(0, len(centers), KNN_BATCH):
+            c, h = centers[s:s + KNN_BATCH], half[s:s + KNN_BATCH]
+            dist, ind = tree.query(c, k=n_query)
+            reach = (dist[:, k - 1] + 2 * np.linalg.norm(h, axis=1)) * (1 + KNN_EPS)
+            # 可达半径内的点没有全部取到的块直接判为失败
+            covered = (n_query == len(fit_X)) | (dist[:, -1] > reach)
+            near, cand = ind[:, :k], ind[:, k:]
+            # 中心处的排序键 |x|² - 2 c·x，再加上线性项在块上的最大增量 2 Σ_d |x_jd - x_id| h_d
+            pts = fit_X[ind]
+            key = bias[ind] - 2 * np.einsum("bqd,bd->bq", pts, c)
+            spread = np.einsum("bked,bd->bke", np.abs(pts[:, None, k:] - pts[:, :k, None]), h)
+            worst = key[:, :k, None] - key[:, None, k:] + 2 * spread
+            tol = KNN_EPS * ((c ** 2).sum(-1) + dist[:, -1] ** 2 + 1)
+            relevant = (labels[near][:, :, None] != labels[cand][:, None, :]) & \
+                (dist[:, None, k:] <= reach[:, None, None])
+            ok = covered & ~np.any(relevant & (worst >= -tol[:, None, None]), axis=(1, 2))
+            out[s:s + KNN_BATCH][ok] = one_hot[labels[near[ok]]].sum(axis=1) / k
+        return out
+
+    def rows_proba(r0, r1):
+        shape = [r1 - r0] + [len(s) for s in scaled[1:]]
+        proba = np.empty(shape + [n_classes])
+        todo = np.ones(shape, dtype=bool)  # 尚未确定的网格点
+        size = KNN_TOP_TILE
+        active = np.ones([-(-n // size) for n in shape], dtype=bool)
+        offset = [r0] + [0] * (ndim - 1)
+        while size ** ndim >= KNN_MIN_TILE_POINTS and active.any():
+            tiles = np.nonzero(active)
+            t_lo = [t * size for t in tiles]
+            t_hi = [np.minimum(lo + size, n) - 1 for lo, n in zip(t_lo, shape)]
+            c_lo = np.stack([scaled[p][offset[p] + lo] for p, lo in enumerate(t_lo)], axis=1)
+            c_hi = np.stack([scaled[p][offset[p] + hi] for p, hi in enumerate(t_hi)], axis=1)
+            # 块中心换回特征顺序再判定 (训练点按特征顺序存放)
+            known = certify(((c_lo + c_hi) / 2)[:, order], ((c_hi - c_lo) / 2)[:, order])
+
+            # 把块值放大回网格分辨率，只写入本层判定成功的块
+            ok = ~np.isnan(known[:, 0])
+            level = np.full(active.shape + (n_classes,), np.nan)
+            level[tuple(t[ok] for t in tiles)] = known[ok]
+            failed = np.zeros(active.shape, dtype=bool)
+            failed[tuple(t[~ok] for t in tiles)] = True
+            for p in range(ndim):
+                level = np.repeat(level, size, axis=p)
+            level = level[tuple(slice(0, n) for n in shape)]
+            done = ~np.isnan(level[..., 0])
+            proba[done] = level[done]
+            todo &= ~done
+
+            size //= 2
+            for p in range(ndim):
+                failed = np.repeat(failed, 2, axis=p)
+            active = failed[tuple(slice(0, -(-n // size)) for n in shape)]
+
+        # 剩余未判定的点合并成一次 sklearn 调用
+        proba = proba.reshape(-1, n_classes)
+        rest = np.flatnonzero(todo)
+        if rest.size:
+            proba[rest] = model.predict_proba(grid_points_at(axes, r0 * row_points + rest))
+        return proba
+
+    def fast(r0, r1):
+        starts = range(r0, r1, KNN_TOP_TILE)
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            proba = np.concatenate(list(pool.map(lambda a: rows_proba(a, min(a + KNN_TOP_TILE, r1)), starts)))
+        if method == "predict":
+            return est.classes_[np.argmax(proba, axis=1)]
+        return proba
+
+    fast.kind = "knn_blocks"
+    return fast
+
+
+# === 11. 大数据散点缩减 ===
+# 样本数超过每个子图的点数预算时，每个类别在公共的像素 (2D) / 体素 (3D) 网格上合并：
+# 每个非空单元画一个点 (单元内样本的质心)，标记大小随单元内样本数按对数放大。
+# 误分类样本与决策边界附近的样本 (前两类概率差小于 SCATTER_BOUNDARY_MARGIN) 始终逐点保留。
+# 预算按页面给出 (IRIS_SCATTER_BUDGET，默认 20000 点)，由页面上带散点的子图均分；未超出时逐点绘制，页面不变
+SCATTER_BUDGET = int(os.environ.get("IRIS_SCATTER_BUDGET", 20000))
+SCATTER_BOUNDARY_MARGIN = 0.2
+_class_indices = {}
+
+
+def class_indices(y):
+    """{类别: 样本下标}，同一个标签数组只计算一次 (get_data 返回的数组在进程内是同一个对象)"""
+    entry = _class_indices.get(id(y))
+    if entry is None or entry[0] is not y:
+        entry = _class_indices[id(y)] = (y, {c: np.flatnonzero(y == c) for c in np.unique(y)})
+    return entry[1]
+
+
+def scatter_budget(panels=None):
+    """每个子图的点数预算；panels 默认为选中的模型个数 (IRIS_MODELS / --models，每个模型一个带散点的子图)"""
+    return max(1, SCATTER_BUDGET // (panels or len(_selected_registry())))
+
+
+def scatter_keep(X, y, model, budget):
+    """需要缩减时返回必须逐点保留的样本 (误分类 + 边界附近) 的布尔掩码，否则返回 None"""
+    if len(X) <= budget:
+        return None
+    fitted = fit_model(X, y, model)
+    proba = evaluate_chunked(fitted, X, "predict_proba")[0]
+    pred = fitted.classes_[np.argmax(proba, axis=1)]
+    return (pred != y) | (probability_margin(proba) < SCATTER_BOUNDARY_MARGIN)
+
+
+def _bin_points(P, lo, hi, target):
+    """把 P 合并到约 target 个等宽单元中，返回 (单元质心, 单元内样本数)"""
+    ndim = P.shape[1]
+    bins = max(1, int(target ** (1 / ndim)))
+    width = np.where(hi > lo, hi - lo, 1.0)
+    cell = np.clip(((P - lo) / width * bins).astype(np.intp), 0, bins - 1)
+    ids, inverse, counts = np.unique(np.ravel_multi_index(cell.T, (bins,) * ndim),
+                                     return_inverse=True, return_counts=True)
+    centers = np.stack([np.bincount(inverse, weights=P[:, d], minlength=len(ids)) for d in range(ndim)], axis=1)
+    return centers / counts[:, None], counts
+
+
+def scatter_layers(X, y, budget, keep=None):
+    """
+    每个类别一层散点：{类别: (点, 计数)}
+    总样本数不超过 budget 时原样返回 (计数为 None)；否则按类别分配预算合并成单元，keep 中的样本计数为 1
+    """
+    indices = class_indices(y)
+    if len(X) <= budget:
+        return {c: (X[idx], None) for c, idx in indices.items()}
+
+    keep = np.zeros(len(X), dtype=bool) if keep is None else keep
+    n_keep = int(keep.sum())
+    room = max(budget - n_keep, len(indices))
+    lo, hi = X.min(axis=0), X.max(axis=0)
+    layers = {}
+    for c, idx in indices.items():
+        kept, binned = idx[keep[idx]], idx[~keep[idx]]
+        share = max(1, room * len(binned) // max(1, len(X) - n_keep))
+        centers, counts = _bin_points(X[binned], lo, hi, share) if len(binned) else (X[:0], np.zeros(0, int))
+        layers[c] = (np.concatenate([X[kept], centers]), np.concatenate([np.ones(len(kept), int), counts]))
+    return layers
+
+
+def scatter_sizes(counts, size):
+    """标记大小：未缩减时就是 size；缩减后按单元内样本数的对数放大"""
+    return size if counts is None else size * (1 + 0.5 * np.log2(counts))
+
+
+# 类别配色：前三类沿用 iris 页面原来的颜色，类别更多时依次取 plotly 的定性调色板 / 顺序颜色表，仍不够时循环
+CLASS_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c"] + [c.lower() for c in qualitative.D3[3:]]  # 散点 (深色)
+LIGHT_CLASS_COLORS = ["#a6cee3", "#fdbf6f", "#b2df8a"] + \
+    [qualitative.Pastel1[i] for i in (0, 3, 6, 7, 8)]  # 决策区域 (浅色，与 CLASS_COLORS 第 4~8 个色相对应)
+CLASS_COLORSCALES = ["Blues", "Oranges", "Greens", "Reds", "Purples", "Greys"]  # 概率图 / 概率壳
+
+
+def class_colors(n, palette=CLASS_COLORS):
+    """n 个类别各自的颜色 (或颜色表名)"""
+    return [palette[i % len(palette)] for i in range(n)]
+
+
+# === 12. 多分辨率 LOD 金字塔 ===
+# 只在最细一级上预测；更粗的级别隔点抽取最细网格上的结果 (节点严格重合，不重新预测)。
+# 最细一级每维 m * 2^(LOD_LEVELS-1) + 1 个点，每一级都能整除 (如 97 -> 49 -> 25)。
+# 页面先显示最粗一级，更细的级别按需加载切换 (见 save_html 的 lod 参数)
+LOD_LEVELS = 3
+
+
+def lod_resolution(resolution):
+    """不小于 resolution 的最近的 m * 2^(LOD_LEVELS-1) + 1 (任意 levels <= LOD_LEVELS 的金字塔都能逐级对半)"""
+    step = 2 ** (LOD_LEVELS - 1)
+    return max(1, -(-(resolution - 1) // step)) * step + 1
+
+
+def lod_grids(grid, levels=LOD_LEVELS):
+    """最细网格 -> 各级网格 (从粗到细)"""
+    return [grid.coarsen(2 ** (levels - 1 - level)) for level in range(levels)]
+
+
+def lod_pyramid(values, grid, levels=LOD_LEVELS):
+    """最细网格上的展平结果 (N, ...) -> 各级网格上的展平结果 (从粗到细)"""
+    full = np.asarray(values).reshape(grid.shape + np.shape(values)[1:])
+    pyramid = []
+    for level in range(levels):
+        step = 2 ** (levels - 1 - level)
+        coarse = full[(slice(None, None, step),) * grid.ndim]
+        pyramid.append(coarse.reshape((-1,) + full.shape[grid.ndim:]))
+    return pyramid
+
+
+# === 13. 快速图形组装 (dict 后端) ===
+# graph_objects 在 add_trace / 构造 trace 时逐个属性校验，大数组还要复制成只读副本，组装大页面时开销明显。
+# dict 后端的 trace 是普通 dict，只经过 plotly 的公开接口：
+#   - 数组换成单元素占位数组，其余标量连同占位数组交给 go.<Trace>(...).to_plotly_json() 做校验与类型转换
+#     (如颜色表名展开)，键的顺序由 plotly 决定；之后原数组按占位编号原样放回，不校验、不复制
+#   - layout 很小，直接交给 make_subplots 得到的 go.Figure 维护
+# 因此生成的页面与 graph_objects 路径逐字节一致 (python benchmark.py --check 会比较两个后端)。
+# IRIS_FIGURE_BACKEND=plotly 可退回 graph_objects
+FIGURE_BACKEND = os.environ.get("IRIS_FIGURE_BACKEND", "dict")
+_TRACE_CLASSES = {}
+
+
+def _trace_class(trace_type):
+    """trace 类型名 -> graph_objects 类 (如 "mesh3d" -> go.Mesh3d)，每种类型只查一次"""
+    if trace_type not in _TRACE_CLASSES:
+        _TRACE_CLASSES[trace_type] = type(go.Figure({"data": [{"type": trace_type}]}).data[0])
+    return _TRACE_CLASSES[trace_type]
+
+
+def _stash_arrays(props, arrays):
+    """props 中的数组 (含嵌套 dict 里的) 换成 [编号] 占位数组，原数组依次存入 arrays"""
+    stashed = {}
+    for key, value in props.items():
+        if isinstance(value, dict):
+            value = _stash_arrays(value, arrays)
+        elif isinstance(value, np.ndarray):
+            arrays.append(value)
+            value = np.array([len(arrays) - 1])
+        stashed[key] = value
+    return stashed
+
+
+def _restore_arrays(node, arrays, restored):
+    """把 to_plotly_json 结果中的占位数组换回原数组 (校验器可能把占位数组转成浮点或字符串，编号不变)"""
+    for key, value in node.items():
+        if isinstance(value, dict):
+            _restore_arrays(value, arrays, restored)
+        elif isinstance(value, np.ndarray):
+            restored.append(int(float(value.flat[0])))
+            node[key] = arrays[restored[-1]]
+    return node
+
+
+def _sorted_props(node):
+    """各层属性都按名称排序 (graph_objects 把 trace 加入 Figure 时会从 dict 重新构造一次)"""
+    return {k: _sorted_props(v) if isinstance(v, dict) else v for k, v in sorted(node.items())}
+
+
+def make_trace(trace_type, **props):
+    """按当前后端构造一个 trace：dict 后端返回普通 dict，否则返回 graph_objects 对象 (如 go.Heatmap)"""
+    cls = _trace_class(trace_type)
+    if FIGURE_BACKEND != "dict":
+        return cls(**props)
+    arrays, restored = [], []
+    trace = _restore_arrays(cls(**_stash_arrays(props, arrays)).to_plotly_json(), arrays, restored)
+    if len(restored) != len(arrays):  # 个别属性的校验器不保留数组 (如转成列表)：整体交给 graph_objects
+        trace = cls(**props).to_plotly_json()
+    return trace
+
+
+class FigureSpec:
+    """
+    graph_objects.Figure 的 dict 版本，只实现各任务用到的部分：
+    add_trace(row, col)、update_layout、update_xaxes / update_yaxes、to_plotly_json、to_html
+    trace 以 dict 保存在 data 中；layout 由内部的 go.Figure (不含 trace) 维护
+    """
+
+    def __init__(self, figure=None):
+        self.data = []
+        self._figure = go.Figure() if figure is None else figure
+
+    @classmethod
+    def subplots(cls, **kwargs):
+        """参数同 make_subplots"""
+        return cls(make_subplots(**kwargs))
+
+    def _subplot_ref(self, row, col):
+        """第 row 行第 col 列子图的引用：{"scene": "scene2"} 或 {"xaxis": "x2", "yaxis": "y2"}"""
+        subplot = self._figure.get_subplot(row, col)
+        if isinstance(subplot, tuple):
+            return {"xaxis": "x" + subplot.xaxis.plotly_name[5:], "yaxis": "y" + subplot.yaxis.plotly_name[5:]}
+        return {subplot.plotly_name.rstrip("0123456789"): subplot.plotly_name}
+
+    def add_trace(self, trace, row=None, col=None):
+        with span("add_trace", type=trace["type"]):
+            trace = dict(_sorted_props({k: v for k, v in trace.items() if k != "type"}), type=trace["type"])
+            if row is not None:
+                trace.update(self._subplot_ref(row, col))
+            self.data.append(trace)
+        return self
+
+    def update_layout(self, dict1=None, **kwargs):
+        self._figure.update_layout(dict1, **kwargs)
+        return self
+
+    def update_xaxes(self, **kwargs):
+        self._figure.update_xaxes(**kwargs)
+        return self
+
+    def update_yaxes(self, **kwargs):
+        self._figure.update_yaxes(**kwargs)
+        return self
+
+    def to_plotly_json(self):
+        return {"data": self.data, "layout": self._figure.to_plotly_json()["layout"]}
+
+    def to_html(self, **kwargs):
+        return go.Figure(self.to_plotly_json()).to_html(**kwargs)
+
+
+def make_figure(**kwargs):
+    """按当前后端创建子图网格：dict 后端返回 FigureSpec，否则返回 plotly 的 make_subplots 结果"""
+    if FIGURE_BACKEND == "dict":
+        return FigureSpec.subplots(**kwargs)
+    return make_subplots(**kwargs)
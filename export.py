@@ -0,0 +1,181 @@
+import os
+import re
+import json
+from importlib import import_module
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from common import get_data, get_models, evaluate_grid, make_3d_grid
+from incremental import write_atomic
+from scheduler import PAGES, task_name, resolution_overrides, apply_overrides, init_worker
+from tracing import span, drain, collect
+
+
+# === 无界面导出 (每个任务的网格、概率体、标签与提取出的边界) ===
+# 输出目录结构 (全部是 .npy，可用 np.load(..., mmap_mode="r") 零拷贝读取，不含 pickle)：
+#   <out>/manifest.json                    任务 -> 任务清单路径
+#   <out>/<任务>/manifest.json             特征名、类别名、网格与每个模型的数组清单 (路径、dtype、形状)
+#   <out>/<任务>/axes/<i>.npy              网格第 i 维的坐标轴
+#   <out>/<任务>/<序号>_<模型>/probs.npy    (*网格形状, K) 概率，列对应清单中的 probability_columns
+#                           labels.npy     网格形状，概率的 argmax (类别编号，即 classes 的下标)
+#                           margin.npy     最大与第二大概率之差；boundary.npy 与相邻点标签不同的点
+#                           <几何>.<数组>.npy  提取出的边界：折线 (x, y) 或三角网格 (vertices, faces[, intensity])
+# 网格形状按 np.meshgrid 默认的 'xy' 索引：前两维为 (y, x)，与页面中使用的展平顺序一致。
+# 每个 (任务, 模型) 单元在 worker 中求值后立即写出自己的文件，只把清单条目带回主进程；
+# 求值经过网格缓存 (common.evaluate_grid)，与页面构建共用拟合与预测结果。
+EXPORT_VERSION = 1
+
+
+def _task1_grid(X):
+    return import_module("task1_2d")._make_grid(X)
+
+
+# 任务名 -> (get_data 参数, X -> 规则网格 (None 表示没有规则网格), compute 结果 -> {几何名: {数组名: 数组}})
+# 网格在调用时才读取任务模块的分辨率常量，因此 --resolution 覆盖同样生效
+EXPORTS = {
+    "task1": (dict(dims=2), _task1_grid,
+              lambda res: {f"region_{c}": path for c, path in enumerate(res["regions"])}),
+    "task2": (dict(dims=3, classes=(0, 1)), lambda X: None,
+              lambda res: {"wall": res["wall"]}),
+    "task3": (dict(dims=3, classes=(0, 1)),
+              lambda X: make_3d_grid(X, resolution=import_module("task3_3d_prob").LOD_RESOLUTION),
+              lambda res: {"wall": res["wall"]}),
+    "task4_boundary": (dict(dims=3),
+                       lambda X: make_3d_grid(X, resolution=import_module("task4_3d_final").BOUNDARY_RESOLUTION),
+                       lambda res: {f"region_{c}": mesh for c, mesh in enumerate(res["regions"])}),
+    "task4_probability": (dict(dims=3),
+                          lambda X: make_3d_grid(X, resolution=import_module("task4_3d_final").PROBABILITY_LOD_RESOLUTION),
+                          lambda res: {f"core_{c}": mesh for c, mesh in enumerate(res["lod"][-1])}),
+}
+
+
+def _slug(idx, name):
+    return f"{idx}_{re.sub(r'[^0-9A-Za-z]+', '_', name).strip('_').lower()}"
+
+
+def _save(task_dir, rel, arr):
+    """写出一个 .npy (先写临时文件再替换)，返回清单条目"""
+    arr = np.asarray(arr)
+    if arr.dtype == object:
+        raise TypeError(f"Refusing to export object array {rel!r} (would need pickle)")
+    path = os.path.join(task_dir, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr, allow_pickle=False)
+    os.replace(tmp, path)
+    return {"path": rel, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+
+
+def export_model(task, idx, out_dir):
+    """一个 (任务, 模型) 单元：求值并写出该模型的全部数组，返回 (清单条目, 追踪事件)"""
+    data_kwargs, make_grid, geometry = EXPORTS[task]
+    _, module_name, compute, _ = next(page for page in PAGES if task_name(page[0]) == task)
+    X, y, _, _ = get_data(**data_kwargs)
+    name, model = get_models()[idx]
+    task_dir = os.path.join(out_dir, task)
+    model_dir = _slug(idx, name)
+    arrays = {}
+
+    with span("export", task=task, model=name):
+        grid = make_grid(X)
+        if grid is not None:
+            ev = evaluate_grid(X, y, model, grid)
+            fields = {"probs": ev.probs.reshape(grid.shape + (-1,)), "labels": ev.labels.reshape(grid.shape),
+                      "margin": ev.margin.reshape(grid.shape), "boundary": ev.boundary.reshape(grid.shape)}
+            for field, arr in fields.items():
+                arrays[field] = _save(task_dir, f"{model_dir}/{field}.npy", arr)
+
+        result = getattr(import_module(module_name), compute)(idx)
+        for geo_name, geo in geometry(result).items():
+            for key, arr in geo.items():
+                arrays[f"{geo_name}.{key}"] = _save(task_dir, f"{model_dir}/{geo_name}.{key}.npy", arr)
+    return {"name": name, "dir": model_dir, "arrays": arrays}, drain()
+
+
+def _task_manifest(task, out_dir):
+    """任务级信息 (坐标轴在主进程写出)；models 由各单元的条目按模型序号填入"""
+    data_kwargs, make_grid, _ = EXPORTS[task]
+    X, y, f_names, t_names = get_data(**data_kwargs)
+    grid = make_grid(X)
+    manifest = {
+        "version": EXPORT_VERSION,
+        "task": task,
+        "features": list(f_names),
+        "classes": [str(t) for t in t_names],
+        "probability_columns": np.unique(y).tolist(),
+        "labels": "argmax of probs (common.evaluate_grid); values are indices into classes",
+        "grid": None,
+        "models": [],
+    }
+    if grid is not None:
+        task_dir = os.path.join(out_dir, task)
+        manifest["grid"] = {
+            "shape": list(grid.shape),
+            "indexing": "xy",
+            "axes": [dict(_save(task_dir, f"axes/{i}.npy", axis), feature=f_names[i])
+                     for i, axis in enumerate(grid.axes)],
+        }
+    return manifest
+
+
+def export_tasks(pages=None, out_dir="export", workers=None, resolution=None):
+    """
+    导出 pages (PAGES 的子集，见 scheduler.select_pages) 对应的任务；每个任务写完全部模型后写出其清单
+    resolution 与构建相同 (见 scheduler.RESOLUTION_KNOBS)
+    """
+    tasks = [task_name(page[0]) for page in (PAGES if pages is None else pages)]
+    overrides = {}
+    for filename, module_name, _, _ in (PAGES if pages is None else pages):
+        overrides.setdefault(module_name, {}).update(resolution_overrides(filename, resolution))
+    saved = apply_overrides(overrides)
+    try:
+        manifests = {task: _task_manifest(task, out_dir) for task in tasks}
+        n_models = len(get_models())
+        units = [(task, idx) for task in tasks for idx in range(n_models)]
+        entries = {task: [None] * n_models for task in tasks}
+
+        def finish(task, idx, node):
+            entry, events = node
+            collect(events)
+            entries[task][idx] = entry
+            print(f"💾 {task}: {entry['name']} -> {os.path.join(out_dir, task, entry['dir'])}")
+            if all(entries[task]):
+                manifests[task]["models"] = entries[task]
+                write_atomic(os.path.join(out_dir, task, "manifest.json"), json.dumps(manifests[task], indent=2))
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            for task, idx in units:
+                finish(task, idx, export_model(task, idx, out_dir))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(overrides,)) as pool:
+                futures = {pool.submit(export_model, task, idx, out_dir): (task, idx) for task, idx in units}
+                for fut in as_completed(futures):
+                    finish(*futures[fut], fut.result())
+    finally:
+        apply_overrides(saved)
+
+    index_path = os.path.join(out_dir, "manifest.json")
+    index = load_manifest(index_path) if os.path.exists(index_path) else {"version": EXPORT_VERSION, "tasks": {}}
+    index["tasks"].update({task: f"{task}/manifest.json" for task in tasks})
+    write_atomic(index_path, json.dumps(index, indent=2))
+    return index_path
+
+
+def load_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def open_export(task_dir):
+    """
+    读取一个任务的导出：返回清单，其中每个数组条目的 "path" 旁多一个 "data" (只读 memmap，零拷贝)
+    网格坐标轴同样在 manifest["grid"]["axes"][i]["data"]
+    """
+    manifest = load_manifest(os.path.join(task_dir, "manifest.json"))
+    entries = [a for m in manifest["models"] for a in m["arrays"].values()]
+    entries += manifest["grid"]["axes"] if manifest["grid"] else []
+    for entry in entries:
+        entry["data"] = np.load(os.path.join(task_dir, entry["path"]), mmap_mode="r", allow_pickle=False)
+    return manifest
@@ -0,0 +1,170 @@
+import os
+import ast
+import glob
+import json
+import hashlib
+from importlib import metadata
+from importlib.util import find_spec
+
+
+# === 增量构建 (按内容寻址的页面依赖) ===
+# 每个页面在 .iris_cache/build.json 中记录其输入的哈希，输入全部未变且页面文件完好时跳过该页：
+#   task     任务模块源码 (不含模块级常量)
+#   grid     任务模块的模块级大写常量 (RESOLUTION、LOD_RESOLUTION 等网格设置) 及命令行的分辨率覆盖
+#   helpers  公共模块源码 (common / octree / tracing / assets，不含模型注册表)
+#   models   模型注册表 (common.MODEL_REGISTRY 的源码) 与模型选择 IRIS_MODELS
+#   dataset  数据源 (IRIS_DATASET 各文件的路径、大小、修改时间) 与标签/特征列设置
+#   env      其余影响输出的 IRIS_* 环境变量，以及 numpy / scipy / scikit-learn / plotly / brotli 版本
+#            (scipy 不被直接导入，但 scikit-learn 的结果依赖它；brotli 决定离线模式是否写出 .br)
+# 页面本身及其附属文件 (LOD 级别，见 companion_paths) 的哈希也记录在案 (按输出路径，见 output_path)：
+# 输出被删除或被改动时同样重建。
+# 指纹只读取源码、文件元数据与环境变量，不导入 sklearn / plotly，因此空构建远小于 1 秒。
+# 运行时 register_model 追加的模型不在源码中，需要 force=True (python main.py --force) 重建。
+MANIFEST_PATH = os.path.join(".iris_cache", "build.json")
+HELPER_MODULES = ["common", "octree", "tracing", "assets"]
+MODEL_NAMES = {"MODEL_REGISTRY"}
+MODEL_ENV = ("IRIS_MODELS",)
+DATASET_ENV = ("IRIS_DATASET", "IRIS_LABEL_COLUMN", "IRIS_FEATURES_2D", "IRIS_FEATURES_3D")
+# 只影响速度/文件位置、不影响页面内容的环境变量
+NEUTRAL_ENV = {"IRIS_TRACE", "IRIS_MODEL_CACHE_DIR", "IRIS_GRID_CACHE_DIR", "IRIS_DATASET_CACHE_DIR",
+               "IRIS_MEMORY_BUDGET_MB", "IRIS_OUTPUT_DIR"}
+VERSIONED_PACKAGES = ["numpy", "scipy", "scikit-learn", "plotly", "brotli"]
+PRECOMPRESSED_SUFFIXES = (".gz", ".br")  # 离线模式下页面与附属文件旁的预压缩版本 (见 assets.write_precompressed)
+
+
+def output_path(filename):
+    """页面的输出路径：IRIS_OUTPUT_DIR (默认当前目录) 下的 filename；绝对路径原样返回"""
+    return os.path.join(os.environ.get("IRIS_OUTPUT_DIR", ""), filename)
+
+
+def write_atomic(path, text):
+    """先写同目录下的临时文件再 os.replace：中断的构建不会留下半截页面；text 可以是 str 或 bytes"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with (open(tmp, "wb") if isinstance(text, bytes) else open(tmp, "w", encoding="utf-8")) as f:
+            f.write(text)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def companion_paths(filename):
+    """页面旁的附属文件：<页面名>.lod<N>.js (见 common.save_html) 及其预压缩版本 .js.gz / .js.br"""
+    stem = glob.escape(os.path.splitext(output_path(filename))[0])
+    return sorted(path for suffix in ("",) + PRECOMPRESSED_SUFFIXES for path in glob.glob(f"{stem}.lod*.js{suffix}"))
+
+
+def _digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode() if isinstance(part, str) else part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def file_digest(path):
+    """文件内容的 sha256；文件不存在时返回 None"""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _split_source(module, pick):
+    """
+    模块源码拆成 (其余部分, 选中的模块级赋值)；pick(名称) 决定选中哪些赋值
+    只解析源码，不导入模块
+    """
+    with open(find_spec(module).origin, encoding="utf-8") as f:
+        lines = f.read().splitlines(keepends=True)
+    picked = set()
+    for node in ast.parse("".join(lines)).body:
+        targets = node.targets if isinstance(node, ast.Assign) else \
+            [node.target] if isinstance(node, ast.AnnAssign) else []
+        if any(isinstance(t, ast.Name) and pick(t.id) for t in targets):
+            picked.update(range(node.lineno - 1, node.end_lineno))
+    rest = "".join(line for i, line in enumerate(lines) if i not in picked)
+    return rest, "".join(lines[i] for i in sorted(picked))
+
+
+def _dataset_fingerprint():
+    """数据源文件的 (路径, 大小, 修改时间) 与列设置；未设置 IRIS_DATASET 时为内置 iris"""
+    parts = [f"{name}={os.environ.get(name, '')}" for name in DATASET_ENV]
+    source = os.environ.get("IRIS_DATASET", "")
+    if source:
+        files = ([os.path.join(source, f) for f in os.listdir(source)] if os.path.isdir(source)
+                 else glob.glob(source))
+        for path in sorted(files):
+            st = os.stat(path)
+            parts.append(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}")
+    return _digest(*parts)
+
+
+def _env_fingerprint():
+    env = sorted(f"{k}={v}" for k, v in os.environ.items() if k.startswith("IRIS_")
+                 and k not in NEUTRAL_ENV and k not in DATASET_ENV and k not in MODEL_ENV)
+    versions = []
+    for package in VERSIONED_PACKAGES:
+        try:
+            versions.append(f"{package}=={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package} missing")
+    return _digest(*env, *versions)
+
+
+def page_inputs(task_module, overrides=None):
+    """
+    一个页面的输入指纹 {组成部分: 哈希}；task_module 为任务模块名 (如 "task1_2d")
+    overrides: 构建时覆盖的模块常量 {名称: 取值} (见 scheduler.resolution_overrides)
+    """
+    task, grid = _split_source(task_module, str.isupper)
+    helpers, models = [], []
+    for module in HELPER_MODULES:
+        rest, registry = _split_source(module, MODEL_NAMES.__contains__)
+        helpers.append(rest)
+        models.append(registry)
+    return {
+        "task": _digest(task),
+        "grid": _digest(grid, json.dumps(overrides or {}, sort_keys=True)),
+        "helpers": _digest(*helpers),
+        "models": _digest(*models, *(f"{k}={os.environ.get(k, '')}" for k in MODEL_ENV)),
+        "dataset": _dataset_fingerprint(),
+        "env": _env_fingerprint(),
+    }
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_atomic(path, json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def stale_reasons(filename, inputs, manifest):
+    """页面需要重建的原因 (空列表 = 已是最新)"""
+    path = output_path(filename)
+    entry = manifest.get(path)
+    if entry is None:
+        return ["new"]
+    reasons = [name for name, digest in inputs.items() if entry["inputs"].get(name) != digest]
+    if file_digest(path) != entry["output"] or \
+            any(file_digest(p) != digest for p, digest in entry.get("companions", {}).items()):
+        reasons.append("output")
+    return reasons
+
+
+def record(manifest, filename, inputs):
+    """页面写出后记录其输入与输出哈希"""
+    path = output_path(filename)
+    manifest[path] = {"inputs": inputs, "output": file_digest(path),
+                      "companions": {p: file_digest(p) for p in companion_paths(filename)}}
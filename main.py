@@ -1,6 +1,10 @@
-import webbrowser
 import os
-import task1_2d, task2_3d_bound, task3_3d_prob, task4_3d_final
+import sys
+import argparse
+import tracing
+from incremental import output_path
+from assets import offline, stylesheet_href, write_assets, write_page
+from scheduler import PAGES, RESOLUTION_KNOBS, build_pages, select_pages, task_name
 
 
 def generate_index_html():
@@ -11,7 +15,7 @@ def generate_index_html():
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>鸢尾花分类可视化项目 - Hor1zen</title>
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+        <link href="%(stylesheet)s" rel="stylesheet">
         <style>
             body { background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%); min-height: 100vh; padding-top: 60px; font-family: 'Microsoft YaHei', sans-serif; }
             .container { background: rgba(255,255,255,0.98); padding: 40px; border-radius: 20px; box-shadow: 0 15px 35px rgba(0,0,0,0.1); }
@@ -154,28 +158,157 @@ def generate_index_html():
     </body>
     </html>
     """
-    with open("index.html", "w", encoding='utf-8') as f:
-        f.write(html_content)
+    write_page(output_path("index.html"), html_content.replace("%(stylesheet)s", stylesheet_href()))
     print("Main Dashboard Updated.")
 
 
-def main():
+# === 命令行 ===
+# 子命令 (省略时为 build)：
+#   python main.py                                   # 构建全部页面并打开仪表盘
+#   python main.py build task1 task4 -r 200          # 只构建指定任务 (task4 = 两个 task4_* 页面)，统一分辨率 200
+#   python main.py build -m "Log Reg,SVM (RBF)" -o out --no-open   # 选择模型、输出目录，不打开浏览器
+#   python main.py build --offline                   # 不依赖 CDN：plotly.js 与样式写入 assets/，页面另写 .gz/.br 预压缩版本
+#   python main.py serve --port 8765                 # 本地交互服务 (旧写法 --serve 仍然有效)
+#   python main.py export task3 -o export            # 不生成页面，把网格、概率体、标签与边界导出为 .npy + JSON 清单
+#   python main.py list                              # 列出任务与模型
+# 启动时只导入标准库与 scheduler / incremental；plotly、sklearn 只在确有页面需要重建 (或 serve / list) 时导入
+COMMANDS = ("build", "serve", "export", "list")
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Build the iris visualisation pages.")
+    sub = parser.add_subparsers(dest="command")
+
+    build = sub.add_parser("build", help="build the static pages (default command)")
+    build.add_argument("tasks", nargs="*", metavar="TASK",
+                       help="tasks to build, e.g. task1 task4_boundary, or a prefix such as task4 (default: all)")
+    build.add_argument("-r", "--resolution", type=int,
+                       help="grid resolution for every selected task (default: each task's own setting)")
+    build.add_argument("-m", "--models", help="comma-separated model names or indices (sets IRIS_MODELS)")
+    build.add_argument("-o", "--output-dir", help="directory for the pages and index.html (sets IRIS_OUTPUT_DIR)")
+    build.add_argument("-j", "--workers", type=int, help="worker processes (default: all cores)")
+    build.add_argument("--force", action="store_true",
+                       help="rebuild every selected page even if its recorded inputs are unchanged")
+    build.add_argument("--offline", action="store_true",
+                       help="reference a shared local plotly.js/CSS in assets/ and write precompressed .gz/.br pages "
+                            "(sets IRIS_ASSETS=local)")
+    build.add_argument("--no-open", action="store_true", help="do not open the dashboard in a browser")
+
+    serve = sub.add_parser("serve", help="run the local interactive server instead of a static build")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("-o", "--output-dir", help="directory with previously built pages (sets IRIS_OUTPUT_DIR)")
+    serve.add_argument("--no-open", action="store_true", help="do not open the explorer in a browser")
+
+    export = sub.add_parser("export", help="write grids, probabilities, labels and boundaries as .npy files")
+    export.add_argument("tasks", nargs="*", metavar="TASK", help="tasks to export (default: all)")
+    export.add_argument("-o", "--output-dir", default="export", help="export directory (default: export)")
+    export.add_argument("-r", "--resolution", type=int, help="grid resolution for every selected task")
+    export.add_argument("-m", "--models", help="comma-separated model names or indices (sets IRIS_MODELS)")
+    export.add_argument("-j", "--workers", type=int, help="worker processes (default: all cores)")
+
+    sub.add_parser("list", help="list the tasks and models")
+    return parser
+
+
+def _normalize(argv):
+    """兼容旧用法：没有子命令时为 build，--serve 等价于 serve 子命令"""
+    if "--serve" in argv:
+        return ["serve"] + [arg for arg in argv if arg != "--serve"]
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        return ["build"] + argv
+    return argv
+
+
+def _set_output_dir(output_dir):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        os.environ["IRIS_OUTPUT_DIR"] = output_dir
+
+
+def _selected_pages(args, parser):
+    if args.resolution is not None and args.resolution < 2:
+        parser.error("--resolution must be at least 2")
+    try:
+        return select_pages(args.tasks) if args.tasks else None
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def run_build(args, parser):
+    pages = _selected_pages(args, parser)
+    _set_output_dir(args.output_dir)
+    if args.models:
+        os.environ["IRIS_MODELS"] = args.models
+    if args.offline:
+        os.environ["IRIS_ASSETS"] = "local"
+
     print("Initializing Project Build...")
+    if offline():
+        for path in write_assets():
+            print(f"📦 Asset: {path}")
 
-    print("1. Building Task 1...")
-    task1_2d.run()
-    print("2. Building Task 2...")
-    task2_3d_bound.run()
-    print("3. Building Task 3...")
-    task3_3d_prob.run()
-    print("4. Building Task 4...")
-    task4_3d_final.run()
+    # 所有 (任务, 模型) 单元在进程池上并行计算，页面在其单元就绪后立即组装；输入未变的页面直接跳过
+    print(f"Building {' '.join(args.tasks) or 'all tasks'} on {args.workers or os.cpu_count()} cores...")
+    build_pages(pages, args.workers, args.force, args.resolution)
 
     generate_index_html()
 
+    # IRIS_TRACE 启用时导出 Chrome trace 并打印各热路径的汇总
+    if tracing.ENABLED:
+        path = tracing.write_chrome_trace()
+        print(tracing.summary_table())
+        print(f"🔍 Trace written to {path} (open in chrome://tracing or ui.perfetto.dev)")
+
+    if args.no_open:
+        print(f"Build Complete. Dashboard: {os.path.realpath(output_path('index.html'))}")
+        return
     print("Build Complete. Opening Dashboard...")
-    webbrowser.open('file://' + os.path.realpath("index.html"))
+    import webbrowser
+    webbrowser.open('file://' + os.path.realpath(output_path("index.html")))
+
+
+def run_serve(args):
+    # 页面按需求值，不预先计算；已经生成过的静态页面仍可从仪表盘打开
+    from server import serve
+    _set_output_dir(args.output_dir)
+    generate_index_html()
+    serve(args.port, open_browser=not args.no_open, root=args.output_dir or ".")
+
+
+def run_export(args, parser):
+    pages = _selected_pages(args, parser)
+    if args.models:
+        os.environ["IRIS_MODELS"] = args.models
+    from export import export_tasks
+    path = export_tasks(pages, args.output_dir, args.workers, args.resolution)
+    if tracing.ENABLED:
+        print(f"🔍 Trace written to {tracing.write_chrome_trace()}")
+    print(f"Export Complete. Manifest: {path}")
+
+
+def run_list():
+    from common import get_models
+    print("Tasks (resolution settings scaled by --resolution):")
+    for filename, module, _, _ in PAGES:
+        knobs = ", ".join(RESOLUTION_KNOBS[task_name(filename)])
+        print(f"  {task_name(filename):<20} {filename:<26} {module + '.py':<20} [{knobs}]")
+    print("Models (select with --models NAME,... or indices):")
+    for idx, (name, _) in enumerate(get_models()):
+        print(f"  {idx}  {name}")
+
+
+def main(argv=None):
+    parser = _parser()
+    args = parser.parse_args(_normalize(sys.argv[1:] if argv is None else list(argv)))
+    if args.command == "serve":
+        run_serve(args)
+    elif args.command == "export":
+        run_export(args, parser)
+    elif args.command == "list":
+        run_list()
+    else:
+        run_build(args, parser)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
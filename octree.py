@@ -0,0 +1,85 @@
+import numpy as np
+
+
+# === 八叉树自适应采样 ===
+# 先在粗网格上采样，只把 "角点跨越阈值" (类别改变 / P 穿过 0.5) 的单元一分为八，
+# 递归到目标深度。等效分辨率 = base * 2**depth，但预测次数只与边界面积成正比。
+#
+# 所有采样点都落在最细一级的整数格点上 (0..N, N = base * 2**depth)，
+# 因此不同层级、相邻单元共享的角点只预测一次。
+
+# 单元 8 个角点的偏移 (x, y, z)
+_CORNERS = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                     [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]])
+
+
+class _LatticeField:
+    """最细格点上的标量场，按需批量求值并记忆 (相邻单元共享角点)"""
+
+    def __init__(self, func, mins, maxs, n):
+        self.func, self.mins, self.n = func, mins, n
+        self.step = (maxs - mins) / n
+        self.keys = np.empty(0, dtype=np.int64)
+        self.vals = np.empty(0)
+
+    def linear(self, ijk):
+        return (ijk[..., 0] * (self.n + 1) + ijk[..., 1]) * (self.n + 1) + ijk[..., 2]
+
+    def to_world(self, ijk):
+        return self.mins + ijk * self.step
+
+    def __call__(self, ijk):
+        lin = self.linear(ijk)
+        flat = lin.ravel()
+        missing = np.setdiff1d(flat, self.keys)
+        if missing.size:
+            n1 = self.n + 1
+            pts = np.stack([missing // (n1 * n1), missing // n1 % n1, missing % n1], axis=1)
+            new_vals = np.asarray(self.func(self.to_world(pts)), dtype=float)
+            keys = np.concatenate([self.keys, missing])
+            order = np.argsort(keys, kind="stable")
+            self.keys = keys[order]
+            self.vals = np.concatenate([self.vals, new_vals])[order]
+        return self.vals[np.searchsorted(self.keys, flat)].reshape(lin.shape)
+
+
+def refine_boundary(func, mins, maxs, base=8, depth=4, threshold=0.5):
+    """
+    自适应提取 func(points) == threshold 的边界面
+    func: (M, 3) 世界坐标 -> (M,) 标量 (例如 P(Class 1)，或某类的 0/1 指示)
+    返回 dict(vertices=(V, 3), faces=(F, 3), n_evaluated, resolution)，可直接交给 go.Mesh3d
+    注意：粗网格必须能分辨边界的拓扑，完全落在一个粗单元内部的小气泡会被漏掉
+    """
+    mins, maxs = np.asarray(mins, dtype=float), np.asarray(maxs, dtype=float)
+    n = base * 2 ** depth
+    field = _LatticeField(func, mins, maxs, n)
+
+    size = 2 ** depth
+    axis = np.arange(base) * size
+    origins = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    for level in range(depth + 1):
+        corners = origins[:, None, :] + _CORNERS * size  # (C, 8, 3)
+        above = field(corners) >= threshold
+        crossing = above.any(axis=1) & ~above.all(axis=1)
+        origins = origins[crossing]
+        if level < depth:
+            size //= 2
+            origins = (origins[:, None, :] + _CORNERS * size).reshape(-1, 3)
+
+    vertices, faces = _polygonize(field, origins, threshold)
+    return {"vertices": vertices, "faces": faces,
+            "n_evaluated": field.keys.size, "resolution": n + 1}
+
+
+def _polygonize(field, origins, threshold):
+    """
+    把最细一级的边界单元转为三角面：与 common.marching_cubes 相同的四面体剖分与查表 (common.tet_surface)，
+    相邻单元共享的棱与面剖分一致，网格无裂缝；二义性的单元 (边界在单元内分成两片) 也得到两片独立的面
+    """
+    from common import tet_surface  # 延迟导入：common 在导入时依赖本模块
+
+    if origins.size == 0:
+        return np.empty((0, 3), dtype=np.float32), np.empty((0, 3), dtype=np.int32)
+    ijk, faces = tet_surface(origins, field, (field.n + 1,) * 3, threshold)
+    return field.to_world(ijk).astype(np.float32), faces.astype(np.int32)
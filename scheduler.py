@@ -0,0 +1,190 @@
+import os
+import math
+from importlib import import_module
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import incremental
+from tracing import span, drain, collect
+
+
+# === 构建图 (DAG) ===
+# 每个页面 = N 个 (任务, 模型) 计算单元 + 1 个页面组装节点
+# 计算单元之间互不依赖；组装节点依赖本页面的全部计算单元
+# 任务模块按名称延迟导入：所有页面都是最新时不必导入 sklearn / plotly (见 incremental)
+PAGES = [
+    ("task1.html", "task1_2d", "compute", "render"),
+    ("task2.html", "task2_3d_bound", "compute", "render"),
+    ("task3.html", "task3_3d_prob", "compute", "render"),
+    ("task4_boundary.html", "task4_3d_final", "compute_boundary", "render_boundary"),
+    ("task4_probability.html", "task4_3d_final", "compute_probability", "render_probability"),
+]
+
+
+def _octree_depth(resolution):
+    """八叉树等效分辨率 8 * 2**depth + 1 最接近 resolution 的深度"""
+    return max(0, int(round(math.log2(max(resolution - 1, 8) / 8))))
+
+
+def _lod_resolution(resolution):
+    """LOD 金字塔最细一级的分辨率 (见 common.lod_resolution)"""
+    from common import lod_resolution
+    return lod_resolution(resolution)
+
+
+# 任务名 (页面文件名去掉 .html) -> {分辨率常量名: 统一分辨率 -> 取值}
+# 命令行的 --resolution 与 benchmark 都按这张表把一个分辨率换算成各任务自己的设置
+RESOLUTION_KNOBS = {
+    "task1": {"RESOLUTION": lambda r: r},
+    "task2": {"BOUNDARY_DEPTH": _octree_depth},
+    "task3": {"LOD_RESOLUTION": _lod_resolution, "BOUNDARY_DEPTH": _octree_depth},
+    "task4_boundary": {"BOUNDARY_RESOLUTION": lambda r: r},
+    "task4_probability": {"PROBABILITY_LOD_RESOLUTION": _lod_resolution},
+}
+
+
+def task_name(filename):
+    return os.path.splitext(filename)[0]
+
+
+def select_pages(names):
+    """
+    按任务名选择页面："task1" / "task4_boundary" 等精确匹配，"task4" 这样的前缀选中 task4_* 全部页面
+    未知的名称抛出 ValueError
+    """
+    selected = []
+    for name in names:
+        matches = [page for page in PAGES
+                   if task_name(page[0]) == name or task_name(page[0]).startswith(name + "_")]
+        if not matches:
+            known = [task_name(page[0]) for page in PAGES]
+            raise ValueError(f"Unknown task {name!r}; available: {known} (or a prefix such as 'task4')")
+        selected += [page for page in matches if page not in selected]
+    return [page for page in PAGES if page in selected]
+
+
+def resolution_overrides(filename, resolution):
+    """页面在统一分辨率下需要覆盖的模块常量 {常量名: 取值}；resolution 为 None 时不覆盖"""
+    if resolution is None:
+        return {}
+    return {name: to_value(resolution) for name, to_value in RESOLUTION_KNOBS[task_name(filename)].items()}
+
+
+def apply_overrides(overrides):
+    """overrides: {模块名: {常量名: 取值}}；返回恢复原值用的同结构 dict"""
+    saved = {}
+    for module_name, values in overrides.items():
+        module = import_module(module_name)
+        saved[module_name] = {name: getattr(module, name) for name in values}
+        for name, value in values.items():
+            setattr(module, name, value)
+    return saved
+
+
+def init_worker(overrides):
+    """worker 初始化：丢弃 fork 继承的追踪事件；以 spawn 启动时重新应用常量覆盖"""
+    drain()
+    apply_overrides(overrides)
+
+
+def _run_node(kind, func, arg, **labels):
+    """执行一个计算/组装节点；连同本进程记录的追踪事件一起返回 (未启用追踪时为空列表)"""
+    with span(kind, **labels):
+        result = func(arg)
+    return result, drain()
+
+
+def stale_pages(pages=None, force=False, resolution=None):
+    """
+    返回需要重建的页面 [(文件名, 模块名, compute 名, render 名, 输入指纹)]，并打印每页的状态
+    输入指纹与 .iris_cache/build.json 中的记录一致且页面文件未被改动时跳过该页；force=True 时全部重建
+    """
+    pages = PAGES if pages is None else pages
+    manifest = incremental.load_manifest()
+    stale = []
+    for filename, module, compute, render in pages:
+        inputs = incremental.page_inputs(module, resolution_overrides(filename, resolution))
+        reasons = ["forced"] if force else incremental.stale_reasons(filename, inputs, manifest)
+        if reasons:
+            print(f"🔁 {filename}: rebuilding ({', '.join(reasons)})")
+            stale.append((filename, module, compute, render, inputs))
+        else:
+            print(f"⏭️  {filename}: up to date")
+    return stale
+
+
+def build_pages(pages=None, workers=None, force=False, resolution=None):
+    """
+    在进程池上并行执行所有 (任务, 模型) 单元，某页的单元全部完成后立即提交该页的组装
+    结果按模型序号归位，因此页面内容与串行构建完全一致 (与完成顺序无关)
+    只重建输入有变化的页面 (见 stale_pages)，每页写出后立即记录到构建清单
+    pages: PAGES 的子集 (见 select_pages)；resolution: 统一分辨率 (见 RESOLUTION_KNOBS)，None 时用各任务的默认值
+    workers=1 时退化为串行执行，便于调试
+    """
+    stale = stale_pages(pages, force, resolution)
+    if not stale:
+        return
+    overrides = {}
+    for filename, module_name, _, _, _ in stale:
+        overrides.setdefault(module_name, {}).update(resolution_overrides(filename, resolution))
+    saved = apply_overrides(overrides)
+    try:
+        _build(stale, overrides, workers)
+    finally:
+        apply_overrides(saved)
+
+
+def _build(stale, overrides, workers):
+    from common import get_models
+
+    manifest = incremental.load_manifest()
+    inputs = {}
+    pages = []
+    for filename, module_name, compute, render, page_inputs in stale:
+        module = import_module(module_name)
+        pages.append((filename, getattr(module, compute), getattr(module, render)))
+        inputs[filename] = page_inputs
+    names = [name for name, _ in get_models()]
+    n_models = len(names)
+    workers = workers or os.cpu_count() or 1
+
+    def finish(node):
+        result, events = node
+        collect(events)
+        return result
+
+    def rendered(filename):
+        incremental.record(manifest, filename, inputs[filename])
+        incremental.save_manifest(manifest)
+
+    if workers == 1:
+        for filename, compute, render in pages:
+            results = [finish(_run_node("compute", compute, idx, task=filename, model=names[idx]))
+                       for idx in range(n_models)]
+            finish(_run_node("render", render, results, task=filename))
+            rendered(filename)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(overrides,)) as pool:
+        results = {filename: [None] * n_models for filename, _, _ in pages}
+        remaining = {filename: n_models for filename, _, _ in pages}
+        renders = {filename: render for filename, _, render in pages}
+
+        pending = {}
+        for filename, compute, _ in pages:
+            for idx in range(n_models):
+                pending[pool.submit(_run_node, "compute", compute, idx,
+                                    task=filename, model=names[idx])] = (filename, idx)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                filename, idx = pending.pop(fut)
+                if idx is None:  # 页面组装节点
+                    finish(fut.result())
+                    rendered(filename)
+                    continue
+                results[filename][idx] = finish(fut.result())
+                remaining[filename] -= 1
+                if remaining[filename] == 0:
+                    pending[pool.submit(_run_node, "render", renders[filename], results.pop(filename),
+                                        task=filename)] = (filename, None)
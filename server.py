@@ -0,0 +1,326 @@
+import os
+import sys
+import json
+import math
+import asyncio
+import argparse
+import mimetypes
+import webbrowser
+from http import HTTPStatus
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import numpy as np
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+import assets
+from common import get_data, get_models, evaluate_grid, get_bounds, GridSpec
+
+
+# === 本地交互服务 (asyncio, 完全离线) ===
+# python main.py --serve   或   python server.py [--port 8765] [--workers N]
+# 路由:
+#   /                 仪表盘 index.html 以及同目录下已生成的任务页面 (plotly.js / Bootstrap 的 CDN 地址改写为本地)
+#   /explore          交互探索页：选择模型 / 分辨率 / 置信度阈值，缩放视图时按需重新求值
+#   /plotly.min.js    plotly 包自带的 plotly.js
+#   /assets/dashboard.css  仪表盘样式 (assets.DASHBOARD_CSS，代替 Bootstrap CDN)
+#   /api/models       模型列表；/api/data 任务一的样本 (花瓣长度/宽度)
+#   /api/grid?model=&res=&threshold=&x0=&x1=&y0=&y1=
+#                     NDJSON 流：同一视图先返回粗分辨率结果，再逐级细化到 res
+# 网格在进程池中求值 (各级同时提交，粗的先完成先发送)；每一级的响应按参数缓存在内存 LRU 中，
+# 概率本身还经过 predict_grid 的磁盘网格缓存，只改阈值时不会重新预测
+DEFAULT_PORT = 8765
+REFINE_LEVELS = 3        # 逐级细化：res/4 -> res/2 -> res
+MAX_RESOLUTION = 400
+RESPONSE_CACHE_SIZE = 256
+PLOTLY_CDN = assets.PLOTLY_CDN.format(version=get_plotlyjs_version())
+DASHBOARD_CSS_URL = "/" + assets.DASHBOARD_CSS_PATH
+
+
+# ==========================================
+# 1. 求值 (在 worker 进程中执行)
+# ==========================================
+def evaluate_view(model_idx, bounds, resolution, threshold):
+    """
+    在视图 bounds = (x0, x1, y0, y1) 上以 resolution 求任务一数据的类别概率
+    返回可直接序列化的 dict：坐标轴、每点的类别 (最大概率低于 threshold 时为 None) 与最大概率
+    """
+    X, y, f_names, t_names = get_data(dims=2)
+    name, model = get_models()[model_idx]
+    x0, x1, y0, y1 = bounds
+    grid = GridSpec((x0, y0), (x1, y1), resolution)
+    ev = evaluate_grid(X, y, model, grid)
+    confidence = np.asarray(ev.probs).max(axis=1).reshape(grid.shape)
+    classes = np.where(confidence >= threshold, ev.labels.reshape(grid.shape), -1)
+    return {"model": name, "resolution": resolution, "x": grid.axes[0].round(6).tolist(),
+            "y": grid.axes[1].round(6).tolist(),
+            "z": [[None if c < 0 else int(c) for c in row] for row in classes],
+            "confidence": confidence.round(3).tolist()}
+
+
+def refine_resolutions(resolution):
+    """逐级细化的分辨率 (从粗到细，去重)"""
+    levels = [max(8, resolution >> shift) for shift in range(REFINE_LEVELS - 1, 0, -1)] + [resolution]
+    return sorted(set(levels))
+
+
+# ==========================================
+# 2. HTTP 服务
+# ==========================================
+def _ndjson_line(obj):
+    return (json.dumps(obj) + "\n").encode()
+
+
+class DashboardServer:
+    def __init__(self, root=".", workers=None):
+        self.root = os.path.realpath(root)
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self.cache = OrderedDict()  # (模型, 视图, 分辨率, 阈值) -> 一行 NDJSON
+        self.inflight = {}          # 同一参数正在计算的 future，并发请求共用
+        self.plotlyjs = None
+
+    # --- 响应缓存 ---
+    async def level(self, key):
+        """一级结果 (一行 NDJSON)；请求被取消时计算继续进行，结果仍然进入缓存"""
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        fut = self.inflight.get(key)
+        if fut is None:
+            fut = self.inflight[key] = asyncio.get_running_loop().run_in_executor(
+                self.pool, evaluate_view, *key)
+            fut.add_done_callback(lambda f: self._store(key, f))
+        await asyncio.shield(fut)
+        return self.cache.get(key) or _ndjson_line(fut.result())
+
+    def _store(self, key, fut):
+        self.inflight.pop(key, None)
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        self.cache[key] = _ndjson_line(fut.result())
+        while len(self.cache) > RESPONSE_CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    # --- 路由 ---
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # 忽略请求头
+            parts = request.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] != "GET":
+                return await self.respond(writer, 405, b"Method Not Allowed", "text/plain")
+            url = urlsplit(parts[1])
+            path, query = unquote(url.path), {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if path == "/api/grid":
+                await self.stream_grid(writer, query)
+            elif path == "/api/models":
+                await self.respond_json(writer, [name for name, _ in get_models()])
+            elif path == "/api/data":
+                X, y, f_names, t_names = get_data(dims=2)
+                mins, maxs = get_bounds(X, margin=1)
+                await self.respond_json(writer, {"x": X[:, 0].tolist(), "y": X[:, 1].tolist(), "label": y.tolist(),
+                                                 "features": list(f_names), "classes": [str(t) for t in t_names],
+                                                 "bounds": [mins[0], maxs[0], mins[1], maxs[1]]})
+            elif path == "/plotly.min.js":
+                if self.plotlyjs is None:
+                    self.plotlyjs = get_plotlyjs().encode()
+                await self.respond(writer, 200, self.plotlyjs, "application/javascript")
+            elif path == DASHBOARD_CSS_URL:
+                await self.respond(writer, 200, assets.DASHBOARD_CSS.encode(), "text/css; charset=utf-8")
+            elif path == "/explore":
+                await self.respond(writer, 200, EXPLORE_HTML.encode(), "text/html; charset=utf-8")
+            else:
+                await self.serve_file(writer, "index.html" if path == "/" else path.lstrip("/"))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # 客户端中途断开 (例如缩放时取消了上一次请求)
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, body, content_type):
+        writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def respond_json(self, writer, obj):
+        await self.respond(writer, 200, json.dumps(obj).encode(), "application/json")
+
+    async def serve_file(self, writer, rel):
+        path = os.path.realpath(os.path.join(self.root, rel))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return await self.respond(writer, 404, b"Not Found", "text/plain")
+        with open(path, "rb") as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if path.endswith(".html"):
+            # 离线：换成本地的 plotly.js 与样式
+            body = body.replace(PLOTLY_CDN.encode(), b"/plotly.min.js")
+            body = body.replace(assets.BOOTSTRAP_CDN.encode(), DASHBOARD_CSS_URL.encode())
+            content_type += "; charset=utf-8"
+        await self.respond(writer, 200, body, content_type)
+
+    async def stream_grid(self, writer, query):
+        """先发粗分辨率结果、再逐级细化 (chunked 传输，一行一个 JSON)"""
+        try:
+            model_idx = int(query.get("model", 0))
+            resolution = min(MAX_RESOLUTION, max(8, int(query.get("res", 100))))
+            threshold = round(float(query.get("threshold", 0.0)), 3)
+            bounds = tuple(round(float(query[k]), 6) for k in ("x0", "x1", "y0", "y1"))
+            # inf / nan 必须在发出 200 之前拒绝：worker 中的错误只能截断已经开始的流
+            if not all(map(math.isfinite, bounds + (threshold,))):
+                raise ValueError
+            if not 0 <= model_idx < len(get_models()) or bounds[0] >= bounds[1] or bounds[2] >= bounds[3]:
+                raise ValueError
+        except (KeyError, ValueError):
+            return await self.respond(writer, 400, b"Bad Request", "text/plain")
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nCache-Control: no-store\r\nConnection: close\r\n\r\n")
+        keys = [(model_idx, bounds, res, threshold) for res in refine_resolutions(resolution)]
+        tasks = [asyncio.ensure_future(self.level(key)) for key in keys]  # 同时提交，按从粗到细的顺序发送
+        try:
+            for task in tasks:
+                line = await task
+                writer.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def serve(port=DEFAULT_PORT, workers=None, open_browser=True, root="."):
+    """启动本地服务 (阻塞，Ctrl+C 结束)"""
+    server = DashboardServer(root, workers)
+    url = f"http://127.0.0.1:{port}/explore"
+    print(f"🌐 Serving dashboard at http://127.0.0.1:{port}/ (interactive explorer: {url})")
+    if open_browser:
+        webbrowser.open(url)
+    try:
+        asyncio.run(server.serve(port=port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
+    finally:
+        server.pool.shutdown(cancel_futures=True)
+
+
+# ==========================================
+# 3. 交互探索页
+# ==========================================
+EXPLORE_HTML = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="UTF-8">
+<title>Interactive Explorer</title>
+<script src="/plotly.min.js"></script>
+<style>
+    body { margin: 0; font-family: 'Microsoft YaHei', sans-serif; background: #f5f7fa; }
+    .bar { display: flex; gap: 18px; align-items: center; padding: 10px 20px; background: #fff;
+           box-shadow: 0 2px 8px rgba(0,0,0,0.08); font-size: 14px; }
+    .bar a { margin-left: auto; color: #0d6efd; text-decoration: none; }
+    #status { color: #888; min-width: 180px; }
+    #plot { height: calc(100vh - 60px); }
+</style>
+</head>
+<body>
+<div class="bar">
+    <label>Model <select id="model"></select></label>
+    <label>Resolution <select id="res"><option>50</option><option selected>100</option>
+        <option>200</option><option>400</option></select></label>
+    <label>Confidence &ge; <input id="threshold" type="range" min="0" max="0.99" step="0.01" value="0">
+        <span id="threshold-value">0.00</span></label>
+    <span id="status"></span>
+    <a href="/">🏠 Dashboard</a>
+</div>
+<div id="plot"></div>
+<script>
+(async function () {
+    const $ = (id) => document.getElementById(id);
+    const colors = ['#a6cee3', '#fdbf6f', '#b2df8a'], dark = ['#1f77b4', '#ff7f0e', '#2ca02c'];
+    const models = await (await fetch('/api/models')).json();
+    const data = await (await fetch('/api/data')).json();
+    models.forEach((name, i) => $('model').add(new Option(name, i)));
+    let view = data.bounds, controller = null;
+
+    const points = data.classes.map((name, c) => ({
+        type: 'scatter', mode: 'markers', name: name,
+        x: data.x.filter((_, i) => data.label[i] === c), y: data.y.filter((_, i) => data.label[i] === c),
+        marker: {size: 6, color: dark[c % dark.length], line: {width: 1, color: 'black'}}
+    }));
+    const n = data.classes.length;
+    const scale = n > 1 ? data.classes.map((_, c) => [c / (n - 1), colors[c % colors.length]])
+                        : [[0, colors[0]], [1, colors[0]]];
+    const layout = {margin: {t: 30, l: 50, r: 20, b: 40}, template: 'plotly_white',
+                    xaxis: {title: data.features[0], range: [view[0], view[1]]},
+                    yaxis: {title: data.features[1], range: [view[2], view[3]]}};
+
+    async function refresh() {
+        if (controller) controller.abort();  // 缩放 / 改参数时放弃上一次请求
+        controller = new AbortController();
+        const q = new URLSearchParams({model: $('model').value, res: $('res').value,
+                                       threshold: $('threshold').value,
+                                       x0: view[0], x1: view[1], y0: view[2], y1: view[3]});
+        $('status').textContent = 'evaluating...';
+        try {
+            const response = await fetch('/api/grid?' + q, {signal: controller.signal});
+            const reader = response.body.getReader(), decoder = new TextDecoder();
+            let buffer = '';
+            for (;;) {
+                const {done, value} = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, {stream: true});
+                let nl;
+                while ((nl = buffer.indexOf('\\n')) >= 0) {
+                    const level = JSON.parse(buffer.slice(0, nl));
+                    buffer = buffer.slice(nl + 1);
+                    const heat = {type: 'heatmap', x: level.x, y: level.y, z: level.z, zmin: 0,
+                                  zmax: Math.max(1, n - 1), colorscale: scale, showscale: false,
+                                  customdata: level.confidence, hoverongaps: false, name: level.model,
+                                  hovertemplate: 'class %{z}<br>confidence %{customdata}<extra></extra>'};
+                    Plotly.react('plot', [heat].concat(points), layout);
+                    $('status').textContent = `${level.model}: ${level.resolution}×${level.resolution}`;
+                }
+            }
+        } catch (e) {
+            if (e.name !== 'AbortError') $('status').textContent = 'error: ' + e;
+        }
+    }
+
+    await Plotly.newPlot('plot', points, layout, {responsive: true});
+    $('plot').on('plotly_relayout', (ev) => {
+        if ('xaxis.range[0]' in ev || 'yaxis.range[0]' in ev || 'xaxis.autorange' in ev) {
+            const xa = $('plot').layout.xaxis.range, ya = $('plot').layout.yaxis.range;
+            layout.xaxis.range = xa; layout.yaxis.range = ya;
+            view = [xa[0], xa[1], ya[0], ya[1]];
+            refresh();
+        }
+    });
+    ['model', 'res', 'threshold'].forEach((id) => $(id).addEventListener('change', refresh));
+    $('threshold').addEventListener('input', () => $('threshold-value').textContent =
+        Number($('threshold').value).toFixed(2));
+    refresh();
+})();
+</script>
+</body>
+</html>
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the dashboard with on-demand grid evaluation.")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-j", "--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--no-browser", action="store_true", help="do not open a browser window")
+    args = parser.parse_args(argv)
+    serve(args.port, args.workers, not args.no_browser)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+import os
+import sys
+import ast
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from sklearn.model_selection import ParameterGrid
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import make_pipeline
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import SVC
+from sklearn.naive_bayes import GaussianNB
+from common import (get_data, fit_model, evaluate_grid, cached_arrays, model_fingerprint, save_html, GridSpec,
+                    class_colors)
+from tracing import span
+
+
+# === 超参数扫描 ===
+# 在任务一的数据 (花瓣长度/宽度, 三分类) 与同一张 2D 网格上评估一组超参数配置，
+# 每个配置一个子图 (决策区域 + 散点，标题附训练集准确率与拟合/求值耗时)，输出 sweep_<名称>.html：
+#   - 两个参数的扫描排成矩阵 (行 = 第一个参数，列 = 第二个参数)
+#   - 其余情况按 --cols 列折行 (small multiples)
+# 配置在进程池上并行计算；已计算过的配置 (记录在 sweep_<名称>.json，网格结果在网格缓存中) 直接跳过。
+#
+# 用法:
+#   python sweep.py knn                                  # k = 1..50
+#   python sweep.py svc                                  # C × gamma 矩阵
+#   python sweep.py svc -p C=0.1,1,10 -p gamma=0.1,1     # 覆盖参数取值
+#   python sweep.py knn -p n_neighbors=1:31:2 -j 4       # start:stop[:step]，4 个进程
+RESOLUTION = 100  # 热力图背景的网格分辨率
+MARGIN = 1
+SUBPLOT_HEIGHT = 220
+
+# 扫描名 -> (估计器类, 固定参数, 默认参数网格)
+SWEEPS = {
+    "knn": (KNeighborsClassifier, {}, {"n_neighbors": list(range(1, 51))}),
+    # 固定 random_state：SVC 的 Platt 概率校准内部使用随机交叉验证
+    "svc": (SVC, {"probability": True, "random_state": 0},
+            {"C": [0.1, 1, 10, 100], "gamma": [0.01, 0.1, 1, 10]}),
+    "logreg": (LogisticRegression, {}, {"C": [0.001, 0.01, 0.1, 1, 10, 100]}),
+    "nb": (GaussianNB, {}, {"var_smoothing": [1e-9, 1e-6, 1e-3, 1e-2, 1e-1, 1]}),
+}
+
+
+def make_model(sweep, params):
+    est_cls, fixed, _ = SWEEPS[sweep]
+    return make_pipeline(StandardScaler(), est_cls(**fixed, **params))
+
+
+def make_grid(X):
+    return GridSpec.from_data(X, RESOLUTION, margin=MARGIN)
+
+
+def config_key(X, y, model, grid):
+    """配置的唯一键：模型指纹 (含全部参数) + 网格 (标签为概率的 argmax，见 common.evaluate_grid)"""
+    return f"sweep-argmax{model_fingerprint(X, y, model)}{grid.mins}{grid.maxs}{grid.resolution}"
+
+
+def label(params):
+    return ", ".join(f"{k}={v}" for k, v in params.items())
+
+
+# ==========================================
+# 1. 单个配置 (在子进程中执行)
+# ==========================================
+def _grid_arrays(X, y, model, grid):
+    """网格上的硬分类与最大类别概率 (按配置缓存)"""
+    def compute():
+        ev = evaluate_grid(X, y, model, grid)
+        return {"preds": ev.labels.reshape(grid.shape),
+                "confidence": np.asarray(ev.probs).max(axis=1).reshape(grid.shape)}
+    return cached_arrays(config_key(X, y, model, grid), compute)
+
+
+def run_config(sweep, params):
+    """拟合并求值一个配置，返回 (记录, 网格结果)"""
+    X, y, _, _ = get_data(dims=2)
+    grid = make_grid(X)
+    model = make_model(sweep, params)
+
+    start = time.perf_counter()
+    fitted = fit_model(X, y, model)
+    fit_s = time.perf_counter() - start
+    start = time.perf_counter()
+    arrays = _grid_arrays(X, y, model, grid)
+    eval_s = time.perf_counter() - start
+
+    record = {"params": params, "fit_s": fit_s, "eval_s": eval_s,
+              "accuracy": float(fitted.score(X, y))}
+    return record, arrays
+
+
+# ==========================================
+# 2. 扫描与页面
+# ==========================================
+def run_sweep(sweep, param_grid=None, workers=None, manifest_path=None):
+    """
+    计算 param_grid 中的每个配置，返回按配置顺序排列的 [(记录, 网格结果)]
+    manifest_path 中已有的配置不再计算 (记录沿用上次的耗时，网格结果从缓存读取)
+    """
+    param_grid = param_grid or SWEEPS[sweep][2]
+    configs = list(ParameterGrid(param_grid))
+    X, y, _, _ = get_data(dims=2)
+    grid = make_grid(X)
+    keys = [config_key(X, y, make_model(sweep, p), grid) for p in configs]
+
+    manifest = {}
+    if manifest_path and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    results = [None] * len(configs)
+    todo = []
+    for i, (params, key) in enumerate(zip(configs, keys)):
+        if key in manifest:
+            record = dict(manifest[key], cached=True)
+            results[i] = (record, _grid_arrays(X, y, make_model(sweep, params), grid))
+        else:
+            todo.append(i)
+    print(f"🔎 Sweep '{sweep}': {len(configs)} configurations, "
+          f"{len(configs) - len(todo)} already computed, {len(todo)} to run")
+
+    workers = min(workers or os.cpu_count() or 1, max(1, len(todo)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {i: pool.submit(run_config, sweep, configs[i]) for i in todo}
+        for n, (i, fut) in enumerate(futures.items(), 1):
+            record, arrays = fut.result()
+            results[i] = (dict(record, cached=False), arrays)
+            manifest[keys[i]] = record
+            print(f"⏱️  [{n}/{len(todo)}] {label(configs[i])}: fit {record['fit_s'] * 1000:.0f} ms, "
+                  f"eval {record['eval_s'] * 1000:.0f} ms, acc {record['accuracy']:.3f}")
+
+    if manifest_path and todo:
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+    return results
+
+
+def _layout(param_grid, n, cols):
+    """两个参数的网格排成矩阵 (ParameterGrid 按参数名排序，最后一个参数变化最快)；否则按 cols 折行"""
+    names = sorted(param_grid)
+    if len(names) == 2:
+        return len(param_grid[names[0]]), len(param_grid[names[1]])
+    cols = min(cols, n)
+    return -(-n // cols), cols
+
+
+def render_sweep(sweep, param_grid, results, cols=5, filename=None):
+    """每个配置一个小图：决策区域 (透明度表示置信度) + 散点"""
+    X, y, f_names, t_names = get_data(dims=2)
+    grid = make_grid(X)
+    x_axis, y_axis = grid.axes
+    rows, cols = _layout(param_grid, len(results), cols)
+
+    titles = [f"{label(r['params'])}<br>acc {r['accuracy']:.3f} · fit {r['fit_s'] * 1000:.0f} ms · "
+              f"eval {r['eval_s'] * 1000:.0f} ms" for r, _ in results]
+    with span("make_subplots"):
+        fig = make_subplots(rows=rows, cols=cols, subplot_titles=titles,
+                            vertical_spacing=min(0.3 / rows, 0.08), horizontal_spacing=0.02,
+                            shared_xaxes=True, shared_yaxes=True)
+
+    decision_colors = [[0, '#a6cee3'], [0.5, '#fdbf6f'], [1, '#b2df8a']]
+    scatter_colors = class_colors(len(t_names))
+    for idx, (record, arrays) in enumerate(results):
+        row, col = idx // cols + 1, idx % cols + 1
+        fig.add_trace(go.Heatmap(
+            x=x_axis, y=y_axis, z=arrays["preds"],
+            colorscale=decision_colors, showscale=False, zsmooth=False,
+            name=label(record["params"])
+        ), row=row, col=col)
+        # 低置信度区域蒙上一层白色：概率越接近均匀分布越白
+        fig.add_trace(go.Heatmap(
+            x=x_axis, y=y_axis, z=1 - arrays["confidence"],
+            colorscale=[[0, 'rgba(255,255,255,0)'], [1, 'rgba(255,255,255,1)']],
+            zmin=0, zmax=1 - 1 / len(t_names), showscale=False, zsmooth='best',
+            hoverinfo='skip'
+        ), row=row, col=col)
+        for cls_idx in range(len(t_names)):
+            mask = y == cls_idx
+            fig.add_trace(go.Scatter(
+                x=X[mask, 0], y=X[mask, 1], mode='markers',
+                marker=dict(size=4, color=scatter_colors[cls_idx], line=dict(width=0.5, color='black')),
+                showlegend=(idx == 0), name=t_names[cls_idx]
+            ), row=row, col=col)
+
+    fig.update_layout(height=SUBPLOT_HEIGHT * rows + 120,
+                      title_text=f"Hyperparameter Sweep: {sweep} ({len(results)} configurations)",
+                      margin=dict(l=20, r=20, t=100, b=20))
+    fig.update_annotations(font_size=10)
+    fig.update_xaxes(showticklabels=False, showgrid=False, zeroline=False)
+    fig.update_yaxes(showticklabels=False, showgrid=False, zeroline=False)
+    save_html(fig, filename or f"sweep_{sweep}.html", f"Sweep: {sweep}")
+
+
+# ==========================================
+# 3. 命令行
+# ==========================================
+def _parse_values(text):
+    """"1,3,5" -> [1, 3, 5]；"1:51[:2]" -> range；其余按 Python 字面量解析，失败时保留字符串"""
+    if ":" in text and "," not in text:
+        return list(range(*(int(part) for part in text.split(":"))))
+    values = []
+    for item in text.split(","):
+        try:
+            values.append(ast.literal_eval(item))
+        except (ValueError, SyntaxError):
+            values.append(item)
+    return values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep classifier hyperparameters on the Task 1 grid.")
+    parser.add_argument("sweep", choices=list(SWEEPS))
+    parser.add_argument("-p", "--param", action="append", default=[], metavar="NAME=VALUES",
+                        help="override one parameter's values, e.g. C=0.1,1,10 or n_neighbors=1:51")
+    parser.add_argument("-j", "--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--cols", type=int, default=5, help="columns for non-matrix layouts")
+    parser.add_argument("-o", "--output", help="page filename (default: sweep_<name>.html)")
+    args = parser.parse_args(argv)
+
+    param_grid = dict(SWEEPS[args.sweep][2])
+    for item in args.param:
+        name, _, values = item.partition("=")
+        if not values:
+            parser.error(f"expected NAME=VALUES, got {item!r}")
+        param_grid[name] = _parse_values(values)
+
+    results = run_sweep(args.sweep, param_grid, args.workers, f"sweep_{args.sweep}.json")
+    render_sweep(args.sweep, param_grid, results, args.cols, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
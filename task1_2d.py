@@ -1,104 +1,132 @@
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
-from common import get_data, get_models, save_html  # 复用公共库
-
-
-def run():
-    # 1. 准备数据 (2特征, 3分类)
-    X, y, f_names, t_names = get_data(dims=2, binary=False)
-    models = get_models()  # 获取 4 个标准化后的模型
-
-    # 2. 创建网格 (用于绘制背景)
-    # 分辨率设为 100 以获得细腻的平滑效果(模拟imshow)
-    resolution = 100
-    x_min, x_max = X[:, 0].min() - 1, X[:, 0].max() + 1
-    y_min, y_max = X[:, 1].min() - 1, X[:, 1].max() + 1
-    xx, yy = np.meshgrid(np.linspace(x_min, x_max, resolution),
-                         np.linspace(y_min, y_max, resolution))
-    grid_points = np.c_[xx.ravel(), yy.ravel()]
-
-    # 3. 初始化 4x4 子图
-    # 行=模型, 列=概率(Class0,1,2) + 决策边界
-    model_names = [m[0] for m in models]
+from plotly.colors import sample_colorscale
+from common import (get_data, get_models, evaluate_grid, save_html, GridSpec,  # 复用公共库
+                    marching_squares, path_trace,
+                    make_figure, make_trace, scatter_budget, scatter_keep, scatter_layers, scatter_sizes,
+                    class_colors, CLASS_COLORS, LIGHT_CLASS_COLORS, CLASS_COLORSCALES)
+from tracing import span
+
+
+# 背景在 compute 中提取成矢量等值线 (marching squares)，页面只含多边形路径，大小与网格分辨率基本无关
+RESOLUTION = 500
+PROB_LEVELS = np.linspace(0, 1, 11)[:-1]  # 概率图的分级：每 0.1 一档，从 0 开始 (第一档即整个网格)
+SIMPLIFY_TOLERANCE = 0.5  # 路径简化容差 (网格步长)，远小于一个屏幕像素
+
+
+def _make_grid(X):
+    """2D 网格 (用于绘制背景)，各维向外扩 1"""
+    return GridSpec.from_data(X, RESOLUTION, margin=1)
+
+
+def compute(idx):
+    """单个 (任务, 模型) 计算单元：拟合第 idx 个模型并在网格上预测"""
+    X, y, f_names, t_names = get_data(dims=2)
+    name, model = get_models()[idx]
+    grid = _make_grid(X)
+
+    # 拟合 + 网格求值 (一次 predict_proba，标签取概率的 argmax；结果缓存在磁盘，未改动的模型/网格对不会重算)
+    ev = evaluate_grid(X, y, model, grid)
+    probs = ev.probs  # (N, 类别数)
+
+    # 提取成封口的多边形：每个类别的决策区域 + 每个类别概率在各档 level 上的上水平集
+    contour = lambda values, level: marching_squares(grid.axes, values, level, closed=True,
+                                                     tolerance=SIMPLIFY_TOLERANCE)
+    with span("marching_squares"):
+        regions = [contour(ev.labels == cls, 0.5) for cls in ev.classes]
+        bands = [[contour(probs[:, cls_idx], level) for level in PROB_LEVELS]
+                 for cls_idx in range(probs.shape[1])]
+    # 样本过多时散点要缩减：误分类与边界附近的样本逐点保留 (每个模型一行 类别数 + 1 个子图)
+    keep = scatter_keep(X, y, model, scatter_budget((len(t_names) + 1) * len(get_models())))
+    return {"name": name, "regions": regions, "bands": bands, "keep": keep}
+
+
+def render(results):
+    """根据全部模型的计算结果组装 (模型数)x(类别数 + 1) 矩阵并保存页面"""
+    # 1. 准备数据 (2特征, iris 为 3分类)
+    X, y, f_names, t_names = get_data(dims=2)
+    n_classes = len(t_names)
+
+    # 2. 网格范围 (背景多边形已在 compute 中提取，这里只用来固定坐标轴范围)
+    x_axis, y_axis = _make_grid(X).axes
+    budget = scatter_budget((n_classes + 1) * len(results))
+
+    # 3. 初始化子图 (默认 4 个模型、3 个类别，即 4x4)
+    # 行=模型, 列=每个类别的概率(Class0,1,2) + 决策边界
+    model_names = [r["name"] for r in results]
     subplot_titles = []
     for name in model_names:
-        subplot_titles.extend([f"{name}<br>Class 0 Prob", "Class 1 Prob", "Class 2 Prob", "Decision"])
-
-    fig = make_subplots(
-        rows=4, cols=4,
-        subplot_titles=subplot_titles,
-        vertical_spacing=0.06, horizontal_spacing=0.04,
-        shared_xaxes=True, shared_yaxes=True
-    )
-
-    # 颜色配置
-    prob_colors = ['Blues', 'Oranges', 'Greens']
-    # 离散决策边界颜色 (浅蓝, 浅橙, 浅绿)
-    decision_colors = [[0, '#a6cee3'], [0.5, '#fdbf6f'], [1, '#b2df8a']]
-    scatter_colors = ['#1f77b4', '#ff7f0e', '#2ca02c']  # 深色用于散点
+        subplot_titles.extend([f"{name}<br>Class 0 Prob"] + [f"Class {c} Prob" for c in range(1, n_classes)] +
+                              ["Decision"])
+
+    with span("make_subplots"):
+        fig = make_figure(
+            rows=len(results), cols=n_classes + 1,
+            subplot_titles=subplot_titles,
+            vertical_spacing=0.06, horizontal_spacing=0.04,
+            shared_xaxes=True, shared_yaxes=True
+        )
+
+    # 颜色配置 (按类别数取色，见 common.class_colors)
+    prob_colors = class_colors(n_classes, CLASS_COLORSCALES)
+    # 每一档用该档区间中点在 colorscale 上的颜色 (与原来 zmin=0, zmax=1 的热力图一致)
+    band_mids = (PROB_LEVELS + np.append(PROB_LEVELS[1:], 1)) / 2
+    band_colors = [sample_colorscale(scale, band_mids) for scale in prob_colors]
+    # 离散决策边界颜色 (浅蓝, 浅橙, 浅绿, ...)
+    decision_colors = class_colors(n_classes, LIGHT_CLASS_COLORS)
+    scatter_colors = class_colors(n_classes, CLASS_COLORS)  # 深色用于散点
 
     print("Calculations started for Task 1 (4x4 Grid)...")
 
-    # 4. 循环建模与绘图
-    for row_idx, (name, model) in enumerate(models):
-        model.fit(X, y)
+    # 4. 循环绘图 (拟合与预测已在 compute 中完成)
+    for row_idx, res in enumerate(results):
+        name = res["name"]
         row = row_idx + 1
+        layers = scatter_layers(X, y, budget, res["keep"])  # {类别: (点, 计数)}
 
-        # 预测网格
-        probs = model.predict_proba(grid_points)  # (N, 3)
-        preds = model.predict(grid_points).reshape(xx.shape)
-
-        # --- 绘制前 3 列 (单类概率图) ---
-        for cls_idx in range(3):
+        # --- 绘制前 n_classes 列 (单类概率图) ---
+        for cls_idx in range(n_classes):
             col = cls_idx + 1
-            prob_grid = probs[:, cls_idx].reshape(xx.shape)
-
-            # A. 概率热力图 (Heatmap)
-            fig.add_trace(go.Heatmap(
-                x=np.linspace(x_min, x_max, resolution),
-                y=np.linspace(y_min, y_max, resolution),
-                z=prob_grid,
-                colorscale=prob_colors[cls_idx],
-                showscale=False,  # 隐藏色条以保持整洁
-                zmin=0, zmax=1,
-                zsmooth='best',
-                name=f'{name} P({cls_idx})'
-            ), row=row, col=col)
+
+            # A. 概率分级图：各档上水平集从低到高叠放，高档覆盖低档
+            for level, band, color in zip(PROB_LEVELS, res["bands"][cls_idx], band_colors[cls_idx]):
+                fig.add_trace(path_trace(
+                    band, fill='toself', fillcolor=color, line=dict(width=0),
+                    showlegend=False,
+                    name=f'{name} P({cls_idx}) ≥ {level:.1f}'
+                ), row=row, col=col)
 
             # B. 对应类别的散点
             # 只画属于当前 Class 的点
-            mask = y == cls_idx
-            fig.add_trace(go.Scatter(
-                x=X[mask, 0], y=X[mask, 1],
+            points, counts = layers.get(cls_idx, (X[:0], None))
+            fig.add_trace(make_trace("scatter",
+                x=points[:, 0], y=points[:, 1],
                 mode='markers',
-                marker=dict(size=6, color='white', line=dict(width=1, color='black')),
+                marker=dict(size=scatter_sizes(counts, 6), color='white', line=dict(width=1, color='black')),
                 showlegend=False,
                 name=f'Class {cls_idx} Data'
             ), row=row, col=col)
 
-        # --- 绘制第 4 列 (最终决策边界) ---
-        # C. 决策背景
-        fig.add_trace(go.Heatmap(
-            x=np.linspace(x_min, x_max, resolution),
-            y=np.linspace(y_min, y_max, resolution),
-            z=preds,
-            colorscale=decision_colors,
-            showscale=False,
-            zsmooth=False,  # 决策边界不需要平滑，要硬切分
-            name='Decision'
-        ), row=row, col=4)
+        # --- 绘制最后一列 (最终决策边界) ---
+        # C. 决策背景：每个类别区域一个填充多边形 (同色细线盖住相邻区域之间的抗锯齿缝)
+        for cls_idx, region in enumerate(res["regions"]):
+            fig.add_trace(path_trace(
+                region, fill='toself', fillcolor=decision_colors[cls_idx],
+                line=dict(width=1, color=decision_colors[cls_idx]),
+                showlegend=False,
+                name='Decision'
+            ), row=row, col=n_classes + 1)
 
         # D. 所有散点 (彩色)
-        for cls_idx in range(3):
-            mask = y == cls_idx
-            fig.add_trace(go.Scatter(
-                x=X[mask, 0], y=X[mask, 1],
+        for cls_idx in range(n_classes):
+            points, counts = layers.get(cls_idx, (X[:0], None))
+            fig.add_trace(make_trace("scatter",
+                x=points[:, 0], y=points[:, 1],
                 mode='markers',
-                marker=dict(size=6, color=scatter_colors[cls_idx], line=dict(width=1, color='black')),
+                marker=dict(size=scatter_sizes(counts, 6), color=scatter_colors[cls_idx],
+                            line=dict(width=1, color='black')),
                 showlegend=(row == 1),  # 图例只在第一行显示
                 name=t_names[cls_idx]
-            ), row=row, col=4)
+            ), row=row, col=n_classes + 1)
 
     # 5. 布局优化
     fig.update_layout(
@@ -111,10 +139,14 @@ def run():
     fig.update_xaxes(showticklabels=False)
     fig.update_yaxes(showticklabels=False)
 
-    fig.update_xaxes(showgrid=False, zeroline=False)
-    fig.update_yaxes(showgrid=False, zeroline=False)
+    fig.update_xaxes(showgrid=False, zeroline=False, range=[x_axis[0], x_axis[-1]])
+    fig.update_yaxes(showgrid=False, zeroline=False, range=[y_axis[0], y_axis[-1]])
 
     save_html(fig, "task1.html", "Task 1: 2D Model Comparison Matrix")
 
 
+def run():
+    render([compute(idx) for idx in range(len(get_models()))])
+
+
 if __name__ == "__main__": run()
\ No newline at end of file
@@ -1,48 +1,57 @@
 # task2_3d_bound.py
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from common import get_data, get_models, make_3d_grid, save_html
-import numpy as np
+from common import (get_data, get_models, boundary_mesh, make_figure, make_trace, mesh_trace, save_html,
+                    scatter_budget, scatter_keep, scatter_layers, scatter_sizes)
+from tracing import span
 
 
-def run():
+# 八叉树细分深度：等效分辨率 8 * 2**depth + 1 (3 -> 65³)
+BOUNDARY_DEPTH = 3
+
+
+def compute(idx):
+    """单个 (任务, 模型) 计算单元：拟合第 idx 个模型并用八叉树自适应提取 P=0.5 决策面"""
+    X, y, f_names, t_names = get_data(dims=3, classes=(0, 1))
+    name, model = get_models()[idx]
+
+    # 只在边界附近加密采样 (拟合与网格结果均被缓存)
+    return {"name": name, "wall": boundary_mesh(X, y, model, threshold=0.5, depth=BOUNDARY_DEPTH),
+            "keep": scatter_keep(X, y, model, scatter_budget())}
+
+
+def render(results):
+    """根据全部模型的计算结果组装 2x2 3D 页面"""
     # 1. 准备数据 (3特征, 2分类)
-    X, y, f_names, t_names = get_data(dims=3, binary=True)
-    xx, yy, zz, grid_points = make_3d_grid(X, resolution=20)  # 降低分辨率保速度
-    models = get_models()
+    X, y, f_names, t_names = get_data(dims=3, classes=(0, 1))
 
     # 2. 创建 2x2 3D子图
     specs = [[{'type': 'scene'}, {'type': 'scene'}], [{'type': 'scene'}, {'type': 'scene'}]]
-    fig = make_subplots(rows=2, cols=2, specs=specs, subplot_titles=[m[0] for m in models])
+    with span("make_subplots"):
+        fig = make_figure(rows=2, cols=2, specs=specs, subplot_titles=[r["name"] for r in results])
 
-    # 3. 循环建模
-    for idx, (name, model) in enumerate(models):
+    # 3. 循环绘图
+    for idx, res in enumerate(results):
         row, col = idx // 2 + 1, idx % 2 + 1
-        model.fit(X, y)
-
-        # 预测概率用于寻找边界
-        probs = model.predict_proba(grid_points)[:, 1].reshape(xx.shape)
-
-        # 绘制等值面 (Decision Boundary Surface)
-        fig.add_trace(go.Isosurface(
-            x=xx.flatten(), y=yy.flatten(), z=zz.flatten(), value=probs.flatten(),
-            isomin=0.45, isomax=0.55, surface_count=1,  # 只显示 0.5 附近的曲面
-            colorscale='Gray', opacity=0.6, showscale=False, name='Boundary'
-        ), row=row, col=col)
-
-        # 绘制散点
-        for cls_id in np.unique(y):
-            fig.add_trace(go.Scatter3d(
-                x=X[y == cls_id, 0], y=X[y == cls_id, 1], z=X[y == cls_id, 2],
-                mode='markers', marker=dict(size=5), name=t_names[cls_id],
+
+        # 绘制决策面 (Decision Boundary Surface, P=0.5)
+        fig.add_trace(mesh_trace(res["wall"], color='gray', opacity=0.6, name='Boundary'), row=row, col=col)
+
+        # 绘制散点 (样本过多时按体素合并)
+        for cls_id, (points, counts) in scatter_layers(X, y, scatter_budget(), res["keep"]).items():
+            fig.add_trace(make_trace("scatter3d",
+                x=points[:, 0], y=points[:, 1], z=points[:, 2],
+                mode='markers', marker=dict(size=scatter_sizes(counts, 5)), name=t_names[cls_id],
                 showlegend=(idx == 0)
             ), row=row, col=col)
 
         # 设置坐标轴标签
         scene_name = f'scene{idx + 1 if idx > 0 else ""}'
-        fig.layout[scene_name].update(xaxis_title=f_names[0], yaxis_title=f_names[1], zaxis_title=f_names[2])
+        fig.update_layout({scene_name: dict(xaxis_title=f_names[0], yaxis_title=f_names[1], zaxis_title=f_names[2])})
 
     save_html(fig, "task2.html", "Task 2: 3D Decision Boundaries (Binary)")
 
 
+def run():
+    render([compute(idx) for idx in range(len(get_models()))])
+
+
 if __name__ == "__main__": run()
\ No newline at end of file
@@ -1,39 +1,52 @@
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from common import get_data, get_models, make_3d_grid, save_html
-import numpy as np
+from common import (get_data, get_models, evaluate_grid, boundary_mesh, make_3d_grid, lod_grids, lod_pyramid,
+                    make_figure, make_trace, mesh_trace, save_html,
+                    scatter_budget, scatter_keep, scatter_layers, scatter_sizes)
+from tracing import span
 
 
-def run():
-    # 1. 准备数据 (3特征, 二分类)
-    X, y, f_names, t_names = get_data(dims=3, binary=True)
+# 概率体的最细分辨率 (见 common.lod_resolution)；页面先显示隔点抽取的 25³，可按需加载 49³ / 97³
+LOD_RESOLUTION = 97
+# 决策面的八叉树细分深度 (等效分辨率 8 * 2**depth + 1)
+BOUNDARY_DEPTH = 3
 
-    # 适当的分辨率，平衡平滑度和性能
-    resolution = 25
-    xx, yy, zz, grid_points = make_3d_grid(X, resolution=resolution)
-    models = get_models()
 
-    # 2. 创建 2x2 3D子图
-    specs = [[{'type': 'scene'}, {'type': 'scene'}], [{'type': 'scene'}, {'type': 'scene'}]]
-    fig = make_subplots(rows=2, cols=2, specs=specs,
-                        subplot_titles=[m[0] for m in models],
-                        vertical_spacing=0.08, horizontal_spacing=0.01)
+def compute(idx):
+    """单个 (任务, 模型) 计算单元：拟合第 idx 个模型并预测网格上 Class 1 的概率"""
+    X, y, f_names, t_names = get_data(dims=3, classes=(0, 1))
+    grid = make_3d_grid(X, resolution=LOD_RESOLUTION)
+    name, model = get_models()[idx]
 
-    print("Task 3: Calculating 3D Volume & Decision Surfaces...")
+    # 只在最细一级上预测 (取 Class 1 的概率；分块求值，拟合与预测结果均被缓存)，粗级隔点抽取
+    probs = evaluate_grid(X, y, model, grid).probs[:, 1]
 
-    for idx, (name, model) in enumerate(models):
-        row, col = idx // 2 + 1, idx % 2 + 1
-        model.fit(X, y)
+    # 决策面用八叉树自适应采样单独提取，只在边界附近加密
+    wall = boundary_mesh(X, y, model, threshold=0.5, depth=BOUNDARY_DEPTH)
+    return {"name": name, "lod": lod_pyramid(probs, grid), "wall": wall,
+            "keep": scatter_keep(X, y, model, scatter_budget())}
 
-        # 预测概率 (取 Class 1 的概率)
-        probs = model.predict_proba(grid_points)[:, 1]
 
-        # --- 核心可视化 1: 概率体积 (Probability Volume) ---
-        # 类似 CT 扫描，用透明度表示概率密度 (0.1 ~ 0.9)
-        # 越接近 0 (Class 0 核心) 为蓝色，越接近 1 (Class 1 核心) 为红色
-        # 中间区域透明，两端不透明
-        fig.add_trace(go.Volume(
-            x=xx.flatten(), y=yy.flatten(), z=zz.flatten(),
+def render(results):
+    """根据全部模型的计算结果组装概率体页面"""
+    # 1. 准备数据 (3特征, 二分类)
+    X, y, f_names, t_names = get_data(dims=3, classes=(0, 1))
+    grids = lod_grids(make_3d_grid(X, resolution=LOD_RESOLUTION))  # 各级的展平坐标只生成一次，四个子图共用
+    lod = [(f"{grid.resolution[0]}³", {}) for grid in grids]
+
+    # 2. 创建 2x2 3D子图
+    specs = [[{'type': 'scene'}, {'type': 'scene'}], [{'type': 'scene'}, {'type': 'scene'}]]
+    with span("make_subplots"):
+        fig = make_figure(rows=2, cols=2, specs=specs,
+                            subplot_titles=[r["name"] for r in results],
+                            vertical_spacing=0.08, horizontal_spacing=0.01)
+
+    print("Task 3: Assembling 3D Volume & Decision Surfaces...")
+
+    # 类似 CT 扫描，用透明度表示概率密度 (0.1 ~ 0.9)
+    # 越接近 0 (Class 0 核心) 为蓝色，越接近 1 (Class 1 核心) 为红色
+    # 中间区域透明，两端不透明
+    def volume(grid, probs, idx):
+        return make_trace("volume",
+            x=grid.flat(0), y=grid.flat(1), z=grid.flat(2),
             value=probs,
             isomin=0.1, isomax=0.9,
             opacity=0.1,  # 整体透明度
@@ -43,40 +56,47 @@ def run():
             caps=dict(x_show=False, y_show=False, z_show=False),  # 不封口，看内部
             name='Prob Volume',
             hoverinfo='skip'
-        ), row=row, col=col)
+        )
+
+    for idx, res in enumerate(results):
+        row, col = idx // 2 + 1, idx % 2 + 1
+
+        # --- 核心可视化 1: 概率体积 (Probability Volume) ---
+        # 页面里先放最粗一级；更细的级别只替换这个 trace
+        for level in range(1, len(grids)):
+            lod[level][1][len(fig.data)] = volume(grids[level], res["lod"][level], idx)
+        fig.add_trace(volume(grids[0], res["lod"][0], idx), row=row, col=col)
 
         # --- 核心可视化 2: 决策面 (Decision Surface P=0.5) ---
         # 精确画出概率为 0.5 的分界墙 (灰色网格)
-        fig.add_trace(go.Isosurface(
-            x=xx.flatten(), y=yy.flatten(), z=zz.flatten(),
-            value=probs,
-            isomin=0.5, isomax=0.5,  # 锁定在 0.5
-            surface_fill=0.6,  # 半透明填充
-            colorscale=[[0, 'gray'], [1, 'gray']],  # 灰色中立
-            showscale=False,
-            slices=dict(z=dict(show=True, locations=[0])),  # 增加切片感
+        fig.add_trace(mesh_trace(
+            res["wall"], color='gray', opacity=0.6,  # 半透明填充
             name='Boundary (P=0.5)'
         ), row=row, col=col)
 
         # --- 原始散点 ---
         colors = ['#1f77b4', '#d62728']  # 蓝 vs 红
-        for cls_id in np.unique(y):
-            fig.add_trace(go.Scatter3d(
-                x=X[y == cls_id, 0], y=X[y == cls_id, 1], z=X[y == cls_id, 2],
+        for cls_id, (points, counts) in scatter_layers(X, y, scatter_budget(), res["keep"]).items():
+            fig.add_trace(make_trace("scatter3d",
+                x=points[:, 0], y=points[:, 1], z=points[:, 2],
                 mode='markers',
-                marker=dict(size=4, color=colors[cls_id], line=dict(width=1, color='black')),
+                marker=dict(size=scatter_sizes(counts, 4), color=colors[cls_id], line=dict(width=1, color='black')),
                 name=t_names[cls_id],
                 showlegend=(idx == 0)
             ), row=row, col=col)
 
         scene_key = f'scene{idx + 1 if idx > 0 else ""}'
-        fig.layout[scene_key].update(
+        fig.update_layout({scene_key: dict(
             xaxis_title=f_names[0],
             yaxis_title=f_names[1],
             zaxis_title=f_names[2]
-        )
+        )})
+
+    save_html(fig, "task3.html", "Task 3: 3D Probability Map (Volume + Iso-Surface)", lod=lod)
 
-    save_html(fig, "task3.html", "Task 3: 3D Probability Map (Volume + Iso-Surface)")
+
+def run():
+    render([compute(idx) for idx in range(len(get_models()))])
 
 
 if __name__ == "__main__": run()
\ No newline at end of file
@@ -1,47 +1,61 @@
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from common import get_data, get_models, make_3d_grid, save_html
+from common import (get_data, get_models, evaluate_grid, make_3d_grid, lod_grids, lod_pyramid,
+                    marching_cubes, isosurface_mesh, make_figure, make_trace,
+                    mesh_trace, save_html, scatter_budget, scatter_keep, scatter_layers, scatter_sizes,
+                    class_colors, CLASS_COLORS, CLASS_COLORSCALES)
+from tracing import span
 import numpy as np
 
 
 # ==========================================
 # Part A: 3D 边界 (硬分类, 3特征)
 # ==========================================
-def run_boundary_task():
+BOUNDARY_RESOLUTION = 20
+
+
+def compute_boundary(idx):
+    """Part A 计算单元：拟合第 idx 个模型，求网格上的硬分类 (概率 argmax) 并提取每个类别区域的外壳"""
+    X, y, f_names, t_names = get_data(dims=3)
+    grid = make_3d_grid(X, resolution=BOUNDARY_RESOLUTION)
+    name, model = get_models()[idx]
+    ev = evaluate_grid(X, y, model, grid)
+
+    # 每个类别的 0/1 指示场在 0.5 处的等值面 = 该类区域的外壳 (不封口，网格边界上的面对阅读无帮助)
+    regions = [marching_cubes(grid.axes, (ev.labels == cls_id).astype(float), 0.5)
+               for cls_id in range(len(t_names))]
+    return {"name": name, "regions": regions, "keep": scatter_keep(X, y, model, scatter_budget())}
+
+
+def render_boundary(results):
     print("Generating Task 4 Part A: Hard Decision Boundaries...")
-    X, y, f_names, t_names = get_data(dims=3, binary=False)
-    xx, yy, zz, grid_points = make_3d_grid(X, resolution=20)
-    models = get_models()
+    X, y, f_names, t_names = get_data(dims=3)
 
     specs = [[{'type': 'scene'}, {'type': 'scene'}], [{'type': 'scene'}, {'type': 'scene'}]]
-    fig = make_subplots(rows=2, cols=2, specs=specs,
-                        subplot_titles=[m[0] for m in models],
-                        vertical_spacing=0.08, horizontal_spacing=0.01)
+    with span("make_subplots"):
+        fig = make_figure(rows=2, cols=2, specs=specs,
+                            subplot_titles=[r["name"] for r in results],
+                            vertical_spacing=0.08, horizontal_spacing=0.01)
 
-    for idx, (name, model) in enumerate(models):
+    colors = class_colors(len(t_names), CLASS_COLORS)
+    for idx, res in enumerate(results):
         row, col = idx // 2 + 1, idx % 2 + 1
-        model.fit(X, y)
-        preds = model.predict(grid_points)
 
         # 1. 绘制实体区域 (Solid Blocks)
-        fig.add_trace(go.Volume(
-            x=xx.flatten(), y=yy.flatten(), z=zz.flatten(), value=preds.flatten(),
-            isomin=0, isomax=2, opacity=0.15, surface_count=3,
-            colorscale=[[0, '#1f77b4'], [0.5, '#ff7f0e'], [1, '#2ca02c']],
-            showscale=False, name='Boundary Region'
-        ), row=row, col=col)
-
-        # 2. 绘制散点
-        colors = ['#1f77b4', '#ff7f0e', '#2ca02c']
-        for cls_id in np.unique(y):
-            fig.add_trace(go.Scatter3d(
-                x=X[y == cls_id, 0], y=X[y == cls_id, 1], z=X[y == cls_id, 2],
-                mode='markers', marker=dict(size=4, color=colors[cls_id], line=dict(width=1, color='black')),
+        for cls_id, region in enumerate(res["regions"]):
+            fig.add_trace(mesh_trace(
+                region, color=colors[cls_id], opacity=0.15, name='Boundary Region'
+            ), row=row, col=col)
+
+        # 2. 绘制散点 (样本过多时按体素合并)
+        for cls_id, (points, counts) in scatter_layers(X, y, scatter_budget(), res["keep"]).items():
+            fig.add_trace(make_trace("scatter3d",
+                x=points[:, 0], y=points[:, 1], z=points[:, 2],
+                mode='markers', marker=dict(size=scatter_sizes(counts, 4), color=colors[cls_id],
+                                            line=dict(width=1, color='black')),
                 name=t_names[cls_id], showlegend=(idx == 0)
             ), row=row, col=col)
 
         scene_key = f'scene{idx + 1 if idx > 0 else ""}'
-        fig.layout[scene_key].update(xaxis_title=f_names[0], yaxis_title=f_names[1], zaxis_title=f_names[2])
+        fig.update_layout({scene_key: dict(xaxis_title=f_names[0], yaxis_title=f_names[1], zaxis_title=f_names[2])})
 
     save_html(fig, "task4_boundary.html", "Task 4A: Multi-Class Decision Boundaries (Hard Split)")
 
@@ -49,62 +63,87 @@ def run_boundary_task():
 # ==========================================
 # Part B: 3D 概率核心 (软分类, 3特征)
 # ==========================================
-def run_probability_task():
-    print("Generating Task 4 Part B: Probability Clouds (Soft Cores)...")
+# 概率壳的最细分辨率 (见 common.lod_resolution)；页面先显示 25³ 网格上的壳，可按需加载 49³
+# (等值面网格随分辨率平方增长，只分两级：97³ 的三类壳会让附属文件超过 40 MB)
+PROBABILITY_LOD_RESOLUTION = 49
+PROBABILITY_LOD_LEVELS = 2
+CORE_LEVELS = np.linspace(0.5, 0.99, 3)  # 只显示概率 > 50% 的部分，画3层壳
+
+
+def compute_probability(idx):
+    """Part B 计算单元：拟合第 idx 个模型并预测网格上每个类别的概率"""
     # 保持 3个特征 !
-    X, y, f_names, t_names = get_data(dims=3, binary=False)
+    X, y, f_names, t_names = get_data(dims=3)
+    grid = make_3d_grid(X, resolution=PROBABILITY_LOD_RESOLUTION)
+    name, model = get_models()[idx]
+    probs = evaluate_grid(X, y, model, grid).probs  # (N, 类别数)，只在最细一级上预测
 
-    # 分辨率稍高一点，为了画出好看的气泡
-    xx, yy, zz, grid_points = make_3d_grid(X, resolution=25)
-    models = get_models()
+    # 每一级 (从粗到细) 为每个类别提取 3 层 "信心气泡" 壳 (0.5, 0.745, 0.99)
+    lod = [[isosurface_mesh(level_grid.axes, level_probs[:, cls_id], CORE_LEVELS)
+            for cls_id in range(probs.shape[1])]
+           for level_grid, level_probs in zip(lod_grids(grid, PROBABILITY_LOD_LEVELS),
+                                              lod_pyramid(probs, grid, PROBABILITY_LOD_LEVELS))]
+    return {"name": name, "lod": lod, "keep": scatter_keep(X, y, model, scatter_budget())}
 
-    specs = [[{'type': 'scene'}, {'type': 'scene'}], [{'type': 'scene'}, {'type': 'scene'}]]
-    fig = make_subplots(rows=2, cols=2, specs=specs,
-                        subplot_titles=[m[0] for m in models],
-                        vertical_spacing=0.08, horizontal_spacing=0.01)
 
-    for idx, (name, model) in enumerate(models):
-        row, col = idx // 2 + 1, idx % 2 + 1
-        model.fit(X, y)
-        probs = model.predict_proba(grid_points)  # (N, 3)
+def render_probability(results):
+    print("Generating Task 4 Part B: Probability Clouds (Soft Cores)...")
+    X, y, f_names, t_names = get_data(dims=3)
 
-        # 颜色定义
-        colors = ['Blues', 'Oranges', 'Greens']  # 对应 Plotly 内置 colorscale 名
+    specs = [[{'type': 'scene'}, {'type': 'scene'}], [{'type': 'scene'}, {'type': 'scene'}]]
+    with span("make_subplots"):
+        fig = make_figure(rows=2, cols=2, specs=specs,
+                            subplot_titles=[r["name"] for r in results],
+                            vertical_spacing=0.08, horizontal_spacing=0.01)
+
+    # 颜色定义 (Plotly 内置 colorscale 名，按类别数取，见 common.class_colors)
+    colors = class_colors(len(t_names), CLASS_COLORSCALES)
+    point_colors = class_colors(len(t_names), CLASS_COLORS)
+
+    def core_trace(core, cls_id):
+        return mesh_trace(
+            core,
+            cmin=CORE_LEVELS[0], cmax=CORE_LEVELS[-1],
+            colorscale=colors[cls_id],
+            showscale=False,
+            opacity=0.3,  # 半透明，允许看到互相穿插
+            name=f'{t_names[cls_id]} Core'
+        )
+
+    grids = lod_grids(make_3d_grid(X, resolution=PROBABILITY_LOD_RESOLUTION), PROBABILITY_LOD_LEVELS)
+    lod = [(f"{grid.resolution[0]}³", {}) for grid in grids]
+    for idx, res in enumerate(results):
+        row, col = idx // 2 + 1, idx % 2 + 1
 
         # 为每个类别画一个 "信心气泡"
-        for cls_id in range(3):
-            # 取出该类的概率场
-            prob_field = probs[:, cls_id]
-
-            # 使用 Isosurface 画出概率 > 0.5 的核心区域
-            # 这显示了模型认为"绝对属于该类"的空间范围
-            fig.add_trace(go.Isosurface(
-                x=xx.flatten(), y=yy.flatten(), z=zz.flatten(),
-                value=prob_field,
-                isomin=0.5,  # 只显示概率 > 50% 的部分
-                isomax=0.99,
-                surface_count=3,  # 画3层壳 (e.g., 0.5, 0.7, 0.9)
-                colorscale=colors[cls_id],
-                showscale=False,
-                opacity=0.3,  # 半透明，允许看到互相穿插
-                name=f'{t_names[cls_id]} Core',
-                caps=dict(x_show=False, y_show=False),
-                hoverinfo='skip'
-            ), row=row, col=col)
+        # 概率 > 0.5 的核心区域显示了模型认为"绝对属于该类"的空间范围
+        # 页面里先放最粗一级的壳，更细的级别只替换对应的 trace
+        for cls_id in range(len(res["lod"][0])):
+            for level in range(1, len(res["lod"])):
+                lod[level][1][len(fig.data)] = core_trace(res["lod"][level][cls_id], cls_id)
+            fig.add_trace(core_trace(res["lod"][0][cls_id], cls_id), row=row, col=col)
 
         # 绘制散点
-        point_colors = ['#1f77b4', '#ff7f0e', '#2ca02c']
-        for cls_id in range(3):
-            fig.add_trace(go.Scatter3d(
-                x=X[y == cls_id, 0], y=X[y == cls_id, 1], z=X[y == cls_id, 2],
-                mode='markers', marker=dict(size=4, color=point_colors[cls_id], line=dict(width=1, color='black')),
+        for cls_id, (points, counts) in scatter_layers(X, y, scatter_budget(), res["keep"]).items():
+            fig.add_trace(make_trace("scatter3d",
+                x=points[:, 0], y=points[:, 1], z=points[:, 2],
+                mode='markers', marker=dict(size=scatter_sizes(counts, 4), color=point_colors[cls_id],
+                                            line=dict(width=1, color='black')),
                 name=t_names[cls_id], showlegend=(idx == 0)
             ), row=row, col=col)
 
         scene_key = f'scene{idx + 1 if idx > 0 else ""}'
-        fig.layout[scene_key].update(xaxis_title=f_names[0], yaxis_title=f_names[1], zaxis_title=f_names[2])
+        fig.update_layout({scene_key: dict(xaxis_title=f_names[0], yaxis_title=f_names[1], zaxis_title=f_names[2])})
 
-    save_html(fig, "task4_probability.html", "Task 4B: Multi-Class Probability Cores (3D)")
+    save_html(fig, "task4_probability.html", "Task 4B: Multi-Class Probability Cores (3D)", lod=lod)
+
+
+def run_boundary_task():
+    render_boundary([compute_boundary(idx) for idx in range(len(get_models()))])
+
+
+def run_probability_task():
+    render_probability([compute_probability(idx) for idx in range(len(get_models()))])
 
 
 def run():
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import nullcontext
+from collections import defaultdict
+
+
+# === 热路径追踪 (Chrome trace-event 格式) ===
+# 设置环境变量 IRIS_TRACE 启用：IRIS_TRACE=1 写入 trace.json，IRIS_TRACE=<路径> 写入指定文件。
+# 结果可在 chrome://tracing 或 https://ui.perfetto.dev 中打开，main.main 结束时另外打印汇总表。
+# 未启用时 span() 直接返回同一个空上下文、traced() 原样返回函数，几乎没有开销。
+#
+# 每个 span 记录一条 "X" (完整) 事件：名称、起止时间、进程/线程号，以及由 tracemalloc 测得的
+#   peak_bytes: 期间已分配内存相对进入时的峰值增量 (包括 numpy 数组的数据缓冲区；先分配后释放的也计入)
+#   net_bytes:  退出时相对进入时的净变化
+# 启用追踪时 tracemalloc 在导入本模块时即开启 (会拖慢分配密集的代码，追踪结果的耗时偏大)；
+# tracemalloc 的峰值是进程级的，嵌套 span 用一个栈把内层的峰值并入外层，其他代码需要重置峰值时
+# 应调用 reset_peak() 而不是 tracemalloc.reset_peak()。
+# 进程池 worker 中记录的事件由 scheduler 随计算结果一起带回主进程。
+TRACE_PATH = os.environ.get("IRIS_TRACE", "")
+ENABLED = bool(TRACE_PATH)
+if TRACE_PATH == "1":
+    TRACE_PATH = "trace.json"
+
+_events = []
+_stack = []  # 打开中的 span: [进入时已分配字节, 期间见到的峰值]
+_NULL = nullcontext()
+
+
+def reset_peak():
+    """tracemalloc.reset_peak()，但先把当前峰值并入打开中的 span (否则它们的峰值会丢失)"""
+    if _stack:
+        _stack[-1][1] = max(_stack[-1][1], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name, self.args = name, args
+
+    def __enter__(self):
+        size = tracemalloc.get_traced_memory()[0]
+        reset_peak()
+        _stack.append([size, size])
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        size, peak = tracemalloc.get_traced_memory()
+        base, seen = _stack.pop()
+        peak = max(peak, seen)
+        if _stack:
+            _stack[-1][1] = max(_stack[-1][1], peak)
+        args = dict(self.args, peak_bytes=peak - base, net_bytes=size - base)
+        _events.append({"name": self.name, "ph": "X", "ts": self.start / 1000, "dur": (end - self.start) / 1000,
+                        "pid": os.getpid(), "tid": threading.get_ident(), "args": args})
+        return False
+
+
+def span(name, **args):
+    """with span("fit", estimator="SVC"): ... —— 未启用时返回空上下文"""
+    return _Span(name, args) if ENABLED else _NULL
+
+
+def traced(name):
+    """函数装饰器版本；未启用时原样返回函数 (零开销)"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        def wrapper(*args, **kwargs):
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = func.__name__, func.__doc__, func
+        return wrapper
+    return decorate
+
+
+def drain():
+    """取出并清空本进程已记录的事件 (worker 把它们随结果返回主进程)"""
+    events = _events[:]
+    del _events[:]
+    return events
+
+
+def collect(events):
+    """把其他进程带回的事件并入本进程"""
+    _events.extend(events)
+
+
+def _instrument_plotly():
+    """
+    给 go.Figure.add_trace 套上 span (类属性，所有已导入的模块都会生效)
+    dict 后端的 common.FigureSpec.add_trace 自己记录同名 span
+    """
+    from plotly.basedatatypes import BaseFigure
+    add_trace = BaseFigure.add_trace
+
+    def traced_add_trace(self, trace, *args, **kwargs):
+        with _Span("add_trace", {"type": getattr(trace, "type", None)}):
+            return add_trace(self, trace, *args, **kwargs)
+    BaseFigure.add_trace = traced_add_trace
+
+
+if ENABLED:
+    tracemalloc.start()
+    _instrument_plotly()
+
+
+# ==========================================
+# 导出
+# ==========================================
+def write_chrome_trace(path=None, events=None):
+    """写出 Chrome trace-event JSON，返回路径"""
+    path = path or TRACE_PATH or "trace.json"
+    events = _events if events is None else events
+    names = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"worker {pid}"}}
+             for pid in sorted({e["pid"] for e in events} - {os.getpid()})]
+    names.append({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "main"}})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": names + events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def summary_table(events=None):
+    """
+    汇总表：按 span 名称 (调用次数 / 总耗时 / 平均耗时 / 单次最大分配峰值) 与按 (任务, 模型) 的计算单元
+    (总耗时 / 最大分配峰值)；返回多行字符串
+    """
+    events = _events if events is None else events
+    by_name = defaultdict(lambda: [0, 0.0, 0])
+    by_unit = defaultdict(lambda: [0.0, 0])
+    for e in events:
+        peak = e["args"].get("peak_bytes", 0)
+        stats = by_name[e["name"]]
+        stats[0] += 1
+        stats[1] += e["dur"] / 1000
+        stats[2] = max(stats[2], peak)
+        if "task" in e["args"]:
+            unit = by_unit[(e["args"]["task"], e["args"].get("model", "-"))]
+            unit[0] += e["dur"] / 1000
+            unit[1] = max(unit[1], peak)
+
+    mb = 1024 ** 2
+    lines = [f"{'span':<24}{'calls':>8}{'total ms':>12}{'mean ms':>10}{'peak MB':>10}"]
+    for name, (calls, total, peak) in sorted(by_name.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"{name:<24}{calls:>8}{total:>12.1f}{total / calls:>10.2f}{peak / mb:>10.1f}")
+    if by_unit:
+        lines += ["", f"{'task':<26}{'model':<14}{'total ms':>12}{'peak MB':>10}"]
+        for (task, model), (total, peak) in sorted(by_unit.items(), key=lambda kv: -kv[1][0]):
+            lines.append(f"{task:<26}{model:<14}{total:>12.1f}{peak / mb:>10.1f}")
+    return "\n".join(lines)